@@ -0,0 +1,90 @@
+__all__ = ['FrameRateController']
+
+
+class FrameRateController:
+    """
+    Adapts the FPS of a single loop (the data loop or a device) to the load, between min_fps and the configured FPS.
+    sample() is fed the loop's totals once a second and tells whether the loop blew its budget, meaning it spent most
+    of the second processing/sending or missed deadlines. Core.adapt_frame_rates() decides which loops to throttle()
+    or recover() from that. Going down is multiplicative and going up additive, so an overloaded host settles quickly
+    and returns to the configured rates in small steps, without oscillating between the two.
+    """
+    busy_limit = 0.9  # share of the time a loop may spend working
+    miss_limit = 0.1  # share of deadlines a loop may miss
+    decrease = 0.75  # factor applied per throttle() step
+    increase = 0.1  # of the configured FPS, added per recover() step
+
+    def __init__(self, fps, min_fps=None, priority=0):
+        self.configure(fps, min_fps, priority)
+
+        # totals of the previous sample()
+        self.busy = None
+        self.ticks = None
+        self.skipped = None
+
+        self.utilization = 0
+        self.miss_ratio = 0
+
+    def configure(self, fps, min_fps=None, priority=0):
+        """
+        (re)sets the configured values, which also undoes any throttling
+        """
+        self.configured_fps = fps
+        self.min_fps = min(min_fps or fps / 4, fps)
+        self.priority = priority
+        self.fps = fps
+
+    def sample(self, busy, ticks, skipped, elapsed):
+        """
+        :param busy: total time spent in frames so far in ms, see LoopMetrics.busy
+        :param ticks: total frames so far, see Pacer.ticks
+        :param skipped: total missed deadlines so far, see Pacer.skipped
+        :param elapsed: seconds since the last call
+        :return: whether the loop blew its budget since the last call
+        """
+        if self.ticks is not None and ticks < self.ticks:  # a new device instance, with a new Pacer
+            self.ticks, self.skipped = ticks, skipped
+
+        if self.busy is not None and elapsed > 0:
+            deadlines = (ticks - self.ticks) + (skipped - self.skipped)
+
+            self.utilization = (busy - self.busy) / (elapsed * 1000)
+            self.miss_ratio = (skipped - self.skipped) / deadlines if deadlines > 0 else 0
+
+        self.busy = busy
+        self.ticks = ticks
+        self.skipped = skipped
+
+        return self.overloaded
+
+    @property
+    def overloaded(self):
+        return self.utilization > self.busy_limit or self.miss_ratio > self.miss_limit
+
+    @property
+    def throttled(self):
+        return self.fps < self.configured_fps
+
+    @property
+    def can_throttle(self):
+        return self.fps > self.min_fps
+
+    def throttle(self):
+        """
+        :return: the new FPS
+        """
+        self.fps = max(self.fps * self.decrease, self.min_fps)
+        return self.fps
+
+    def recover(self):
+        """
+        ramps back up by one step, unless the loop's current utilization suggests it would be overloaded at that rate
+
+        :return: the new FPS
+        """
+        fps = min(self.fps + self.configured_fps * self.increase, self.configured_fps)
+
+        if self.utilization * fps / self.fps <= self.busy_limit:
+            self.fps = fps
+
+        return self.fps
@@ -1,7 +1,11 @@
-import colorsys
+import math
+import threading
+from time import monotonic
 
 import numpy as np
 
+from pacing import Pacer
+
 __all__ = [
     'Device',
 ]
@@ -125,49 +129,334 @@ class Device:
         12000: [0.7647058823529411, 0.8196078431372549, 1.0]
     }
 
+    # (3, n) arrays of the map above, so np.interp can work on them per channel
+    color_temperature_kelvin = np.array(list(color_temperature_map))
+    color_temperature_channels = np.array(list(color_temperature_map.values())).T
+
+    # device config keys whose values are compiled into the color tables
+    color_table_keys = ('brightness', 'color_temperature', 'gamma')
+
+    # device config keys configure() can apply to a running instance, changing any other key needs a new one
+    configurable_keys = {
+        'brightness', 'color_temperature', 'gamma', 'saturation', 'non_linear_brightness', 'flip', 'fps',
+        'align_to_data', 'change_tolerance', 'keepalive', 'interpolation', 'smoothing', 'priority', 'min_fps',
+    }
+
+    # whether loop() may block, for example on a slow serial port. The asyncio scheduler calls those in a worker thread
+    blocking_send = True
+
     def __init__(self, device, name, *args, **kwargs):
         """
         common attributes
         """
         self.name = name
         self.enabled = device.get('enabled')
+        self.leds = device.get('leds', 1)
+
+        self.color_table_config = None
+        self.pacer = Pacer(device.get('fps', 30))
+        self.configure(device)
+
+        # the last processed frame and the sequence number of the data frame it was made from
+        self.frame = None
+        self.frame_sequence = None
+
+        # preallocated buffers of apply_color_correction, see allocate_buffers()
+        self.buffer_shape = None
+        self.work = None
+        self.indices = None
+        self.offsets = None
+        self.values = None
+        self.spread_values = None
+        self.outputs = None
+        self.output_index = 0
+
+        # change detection, see send(). sent_frame is a copy, as the frames themselves are buffers that get reused
+        self.sent_frame = None
+        self.difference = None
+        self.difference_scratch = None
+        self.sent_time = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.frames_dropped = 0  # frames the transport couldn't take in time
 
-        self.brightness = device.get('brightness', 1)
+        self.max_fps = None  # set by transports with a hard throughput limit
+
+        # frames taken from another device with the same processing signature (see Core.process_device) or not
+        self.shared_frames = 0
+        self.unshared_frames = 0
+        self.signature_config = None
+        self.signature = None
+
+        # held by the device loop while a frame is processed and sent, so the transport isn't closed mid-frame
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def configure(self, device):
+        """
+        (re)applies the color and timing settings of a device config.
+        The color tables are only rebuilt if one of the color_table_keys changed.
+        """
         self.non_linear_brightness = device.get('non_linear_brightness', True)
         self.flip = device.get('flip', False)
-        self.leds = device.get('leds', 1)
         self.frame_sleep = 1000 / device.get('fps', 30)
+        self.pacer.set_fps(device.get('fps', 30))
+        self.align_to_data = device.get('align_to_data', False)
         self.saturation = device.get('saturation', 1)
-        self.color_temperature = self.get_color_temperature(device.get('color_temperature'))
+        self.change_tolerance = device.get('change_tolerance', 0)
+        self.keepalive = device.get('keepalive', 1)
+
+        # blending between data frames, see set_target() and interpolate()
+        self.interpolation = device.get('interpolation')
+        if self.interpolation not in (None, 'linear', 'ema'):
+            print(f'WARNING: device "{self.name}" has an unknown interpolation "{self.interpolation}", disabling it.')
+            self.interpolation = None
+        self.smoothing = device.get('smoothing', 100) * 1_000_000  # EMA time constant, from ms to ns
+
+        self.target = None
+        self.target_published_at = 0
+        self.target_interval = 0  # ns between the last two data frames
+        self.origin = None
+        self.scratch = None
+        self.interpolated = None
+        self.interpolated_at = 0
+        self.interpolating = False
+
+        color_table_config = tuple(device.get(key) for key in self.color_table_keys)
+
+        if color_table_config != self.color_table_config:
+            self.color_table_config = color_table_config
+
+            self.brightness = device.get('brightness', 1)
+            self.gamma = device.get('gamma', 1)
+            self.color_temperature = self.get_color_temperature(device.get('color_temperature'))
+            self.build_color_tables()
+
+        # with neutral enhancements the color tables already produce the final frame
+        self.needs_enhancements = self.non_linear_brightness or self.saturation != 1
+
+        self.frame_sequence = None  # so the next frame is processed with the new settings
 
     def get_color_temperature(self, value):
         """
-        takes an input value and rounds it to the nearest 100 value, checks if it is within bounds and uses that
+        takes an input value in Kelvin, checks if it is within bounds and interpolates the channel multipliers
+        between the neighbouring entries of color_temperature_map.
         otherwise just returns [1.0, 1.0, 1.0] which means no temperature setting
         """
         default = [1.0, 1.0, 1.0]
 
-        if type(value) not in (str, int):
+        if type(value) not in (str, int, float):
             return default
         try:
-            key = round(int(value), -2)
+            kelvin = float(value)
         except ValueError:
             return default
 
-        return self.color_temperature_map.get(key, default)
+        lowest, highest = self.color_temperature_kelvin[[0, -1]]
+
+        # the map used to be looked up after rounding to the nearest 100, so keep accepting the same range
+        if not lowest - 50 <= kelvin < highest + 50:
+            return default
+
+        return [
+            float(np.interp(kelvin, self.color_temperature_kelvin, channel))
+            for channel in self.color_temperature_channels
+        ]
 
-    def apply_enhancements(self, data):
+    def build_color_tables(self):
+        """
+        compiles gamma, brightness and color temperature into a 256 entry lookup table per channel.
+        color_table holds float32 values to be refined by apply_enhancements, color_table_u8 the final bytes.
+        Both are flat (3 * 256), so a frame can be corrected with a single np.take using color_table_offsets.
         """
-        adjusts the saturation of input data
+        levels = np.linspace(0, 1, 256) ** self.gamma * 255
+
+        table = (levels * self.brightness * np.array(self.color_temperature)[:, np.newaxis]).clip(0, 255)
+
+        self.color_table = table.astype(np.float32).ravel()
+        self.color_table_u8 = np.rint(table).astype(np.uint8).ravel()
+        self.color_table_offsets = np.arange(3) * 256
+
+    def allocate_buffers(self, shape):
+        """
+        (re)allocates the buffers apply_color_correction works in, whenever the shape of the frames changes.
+        There are two output buffers used in turns, so a frame stays intact for one more frame after it was made,
+        for devices that took it as shared frame and may still be sending it.
+
+        Operands of in-place ufuncs all have the frame's shape, since broadcasting (like adding color_table_offsets
+        to every LED) makes numpy allocate a temporary buffer on every call.
         """
+        self.buffer_shape = shape
+        self.work = np.empty(shape, dtype=np.float32)
+        self.indices = np.empty(shape, dtype=np.intp)
+        self.offsets = np.broadcast_to(self.color_table_offsets, shape).copy()
+        self.values = np.empty(shape[:-1] + (1,), dtype=np.float32)
+        self.spread_values = np.empty(shape, dtype=np.float32)
+        self.outputs = [np.empty(shape, dtype=np.uint8), np.empty(shape, dtype=np.uint8)]
+        self.output_index = 0
+
+    def apply_color_correction(self, data):
+        """
+        turns the output of device_processing into the final frame as uint8 rgb values,
+        using the color tables and apply_enhancements if needed.
+        Everything happens in the preallocated buffers, so no arrays are allocated per frame.
+
+        :return: one of the output buffers, which is overwritten two calls later
+        """
+        data = np.asarray(data)
+
+        if data.shape != self.buffer_shape:
+            self.allocate_buffers(data.shape)
+
+        self.output_index ^= 1
+        output = self.outputs[self.output_index]
+
+        np.copyto(self.work, data, casting='unsafe')
+        np.clip(self.work, 0, 255, out=self.work)
+        np.rint(self.work, out=self.work)
+        np.copyto(self.indices, self.work, casting='unsafe')
+        self.indices += self.offsets
+
+        # mode='clip' writes straight to out, the default one would buffer the result. The indices are in range anyway
+        if not self.needs_enhancements:
+            return self.color_table_u8.take(self.indices, out=output, mode='clip')
+
+        self.color_table.take(self.indices, out=self.work, mode='clip')
+        np.copyto(output, self.apply_enhancements(self.work, out=self.work), casting='unsafe')
+
+        return output
+
+    def apply_enhancements(self, data, out=None):
+        """
+        adjusts the saturation and (if enabled) applies non-linear brightness to input data, for all LEDs at once.
+
+        This is the same as scaling S by the saturation and squaring V (/256) in HSV, but without the round trip:
+        with hue and value fixed, every channel c moves linearly to v - saturation * (v - c),
+        and scaling value by a factor scales all channels by it.
+
+        :param out: float32 array for the result, may be data itself. Without it, a new array is returned
+        """
+        if out is None:
+            out = np.array(data, dtype=np.float32)
+        elif out is not data:
+            np.copyto(out, data, casting='unsafe')
+
+        if out is self.work:  # the preallocated buffers only fit the work buffer
+            np.max(out, axis=-1, keepdims=True, out=self.values)
+            value = self.spread_values
+            np.copyto(value, self.values)
+        else:
+            value = out.max(axis=-1, keepdims=True)
+
+        # value - (value - data) * saturation, rearranged to work in place
+        out -= value
+        out *= np.float32(self.saturation)
+        out += value
 
         if self.non_linear_brightness:
-            new_values = np.array([colorsys.rgb_to_hsv(*value) for value in data]) ** [1, 1, 2]
-            new_values = new_values * [1, self.saturation, 0.00390625]
+            value *= np.float32(0.00390625)
+            out *= value
+
+        return np.clip(out, 0, 255, out=out)
+
+    def set_target(self, data, published_at):
+        """
+        takes the output of device_processing for a new data frame, which interpolate() then blends towards
+
+        :param data: the output of device_processing
+        :param published_at: perf_counter_ns timestamp of the data frame
+        """
+        data = np.asarray(data)
+
+        if self.interpolated is None or self.interpolated.shape != data.shape:
+            self.target = np.empty(data.shape, dtype=np.float32)
+            self.origin = np.empty(data.shape, dtype=np.float32)
+            self.scratch = np.empty(data.shape, dtype=np.float32)
+            self.interpolated = np.array(data, dtype=np.float32)
+            self.target_interval = 0
+        else:
+            self.target_interval = published_at - self.target_published_at
+
+        np.copyto(self.target, data, casting='unsafe')  # a copy, fxmodes may reuse their arrays
+        np.copyto(self.origin, self.interpolated)  # starting from what's displayed, even if it was mid-blend
+        self.target_published_at = published_at
+
+        if not self.interpolating:
+            # interpolate() didn't run while the frame stood still, ema would take that as time spent blending
+            self.interpolated_at = published_at
+        self.interpolating = True
+
+    def interpolate(self, now):
+        """
+        moves the displayed frame towards the latest target, for all LEDs at once.
+        linear reaches it after the time between the last two data frames, so it lags one data frame behind,
+        ema closes the remaining gap exponentially with a time constant of smoothing.
+
+        :param now: perf_counter_ns timestamp of this tick
+        :return: the interpolated frame as float32 array
+        """
+        if self.interpolation == 'ema':
+            alpha = 1 - math.exp(-max(now - self.interpolated_at, 0) / max(self.smoothing, 1))
+
+            np.subtract(self.target, self.interpolated, out=self.scratch)
+            self.scratch *= np.float32(alpha)
+            self.interpolated += self.scratch
+
+            np.subtract(self.target, self.interpolated, out=self.scratch)
+            done = np.abs(self.scratch, out=self.scratch).max(initial=0) < 0.5
         else:
-            new_values = np.array([colorsys.rgb_to_hsv(*value) for value in data]) * [1, self.saturation, 1]
+            progress = (now - self.target_published_at) / self.target_interval if self.target_interval > 0 else 1
+            progress = min(max(progress, 0), 1)
+
+            np.subtract(self.target, self.origin, out=self.interpolated)
+            self.interpolated *= np.float32(progress)
+            self.interpolated += self.origin
+            done = progress == 1
 
-        return np.array([colorsys.hsv_to_rgb(*value) for value in new_values]).clip(0, 255)
+        if done:
+            np.copyto(self.interpolated, self.target)
+            self.interpolating = False
+
+        self.interpolated_at = now
+
+        return self.interpolated
+
+    def frame_changed(self, data):
+        """
+        checks if data differs from the last sent frame by more than change_tolerance on any channel
+        """
+        if self.sent_frame is None or data.shape != self.sent_frame.shape:
+            return True
+
+        # |data - sent_frame| in uint8, without allocating. max - min doesn't wrap around
+        np.maximum(data, self.sent_frame, out=self.difference)
+        np.subtract(self.difference, np.minimum(data, self.sent_frame, out=self.difference_scratch), out=self.difference)
+
+        return self.difference.max(initial=0) > self.change_tolerance
+
+    def send(self, data):
+        """
+        passes data on to loop() unless it's (nearly) the same as the last sent frame.
+        Unchanged frames are still sent every keepalive seconds, so devices like WLED stay in realtime mode.
+
+        :param data: the final uint8 frame
+        """
+        now = monotonic()
+
+        if self.frame_changed(data) or now - self.sent_time >= self.keepalive:
+            if not self.loop(data):
+                return  # dropped, the transport counted it and the next tick tries again
+
+            if self.sent_frame is None or self.sent_frame.shape != data.shape:
+                self.sent_frame = np.empty(data.shape, dtype=np.uint8)
+                self.difference = np.empty(data.shape, dtype=np.uint8)
+                self.difference_scratch = np.empty(data.shape, dtype=np.uint8)
+            np.copyto(self.sent_frame, data, casting='unsafe')
+
+            self.sent_time = now
+            self.frames_sent += 1
+        else:
+            self.frames_skipped += 1
 
     def loop(self, data):
         """
@@ -175,8 +464,16 @@ class Device:
         It should do the necessary work to get the device to display the sent data.
 
         :param data: 2d array containing a list of rgb values for the target device
+        :return: whether the frame went out, dropped frames are neither counted as sent nor compared against
+        """
+        return True
+
+    def close(self):
+        """
+        Releases whatever the device holds open (sockets, serial ports, ...). Extend it in your device class.
+        The instance isn't used anymore afterwards.
         """
-        pass
+        self.closed = True
 
     def __str__(self):
         return self.name
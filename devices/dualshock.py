@@ -1,4 +1,7 @@
 import glob
+import os
+import threading
+from time import monotonic
 
 from .device import Device
 
@@ -9,52 +12,144 @@ __all__ = [
 
 
 class DualShock(Device):
-    ds4_paths = {
-        counter + 1: path
-        for counter, path in enumerate(glob.glob('/sys/class/leds/0005:054C:05C4.*:global'))
-    }
+    # every controller has one LED class device per color channel, named like <controller>:red
+    sysfs_pattern = '/sys/class/leds/0005:054C:05C4.*:global'
+    channels = ('red', 'green', 'blue')
+
+    rescan_interval = 5  # seconds between looking for controllers while one is missing
+
+    # device_num: path of the global LED, filled by rescan()
+    ds4_paths = {}
+    last_scan = 0
+    scan_lock = threading.Lock()
 
     def __init__(self, device, *args, **kwargs):
         super().__init__(device, *args, **kwargs)
 
-        device_num = device.get('device_num')
-        self.path = self.ds4_paths.get(device_num)
+        self.device_num = device.get('device_num')
+        self.path = None
+        self.fds = None
+        self.written = [None] * len(self.channels)  # the values the lightbar has, so only changes are written
+
+        if not DualShock.last_scan:
+            DualShock.rescan()
+
+        if not self.connect():
+            print(f'WARNING: DualShock Controller with device_num {self.device_num} specified,')
+            print(f'but there is no device path available for it. It will be used once it\'s connected.')
+
+    @classmethod
+    def rescan(cls):
+        """
+        looks for connected controllers and numbers them, starting at 1. Blocks while doing so.
+
+        :return: dict of device_num: path
+        """
+        paths = sorted(glob.glob(cls.sysfs_pattern))
+
+        DualShock.ds4_paths = {counter + 1: path for counter, path in enumerate(paths)}
+        DualShock.last_scan = monotonic()
+
+        return DualShock.ds4_paths
+
+    @classmethod
+    def request_rescan(cls):
+        """
+        rescans in a background thread, unless one is running already or the last one is less than
+        rescan_interval ago, so it can be called by the frame loop as often as it likes
+        """
+        if monotonic() - DualShock.last_scan < cls.rescan_interval:
+            return
+
+        if not DualShock.scan_lock.acquire(blocking=False):
+            return
 
-        if not self.path:
-            print(f'WARNING: DualShock Controller with device_num {device_num} specified,')
-            print(f'but there is no device path available for it. Disabling it.')
-            self.enabled = False
+        def scan():
+            try:
+                cls.rescan()
+            finally:
+                DualShock.scan_lock.release()
+
+        threading.Thread(target=scan, daemon=True).start()
+
+    def connect(self):
+        """
+        opens the brightness files of all channels of the controller with our device_num, if it's connected
+
+        :return: whether it succeeded
+        """
+        path = self.ds4_paths.get(self.device_num)
+
+        if not path:
+            return False
+
+        directory, name = os.path.split(path)
+        controller, _, _ = name.rpartition(':')
+
+        fds = []
+        try:
+            for channel in self.channels:
+                fds.append(os.open(os.path.join(directory, f'{controller}:{channel}', 'brightness'), os.O_WRONLY))
+        except OSError:
+            for fd in fds:
+                os.close(fd)
+            return False
+
+        self.path = path
+        self.fds = fds
+        self.written = [None] * len(self.channels)
+
+        return True
+
+    def disconnect(self):
+        for fd in self.fds or []:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+        self.fds = None
 
     def set_dualshock_color(self, color):
         """
-        Sends an rgb color to a DualShock 4 controller for its lightbar
+        Sends an rgb color to a DualShock 4 controller for its lightbar, writing only the channels that changed.
+        If the controller isn't there (anymore), the frame is dropped and it's looked for in the background.
+
         :param color: rgb value that is sent to the lightbar
+        :return: whether the color was written
         """
-        red, green, blue = color
+        if self.fds is None and not self.connect():
+            self.request_rescan()
+            self.frames_dropped += 1
+            return False
 
-        # TODO improve the path handling. [:-6 ain't the best solution]
-        red_path = f'{self.path[:-6]}red/brightness'
-        green_path = f'{self.path[:-6]}green/brightness'
-        blue_path = f'{self.path[:-6]}blue/brightness'
+        try:
+            for channel, value in enumerate(color):
+                value = int(value)
 
-        r = open(red_path, 'w')
-        r.write(str(red))
-        r.close()
+                if value != self.written[channel]:
+                    os.pwrite(self.fds[channel], b'%d' % value, 0)
+                    self.written[channel] = value
 
-        g = open(green_path, 'w')
-        g.write(str(green))
-        g.close()
+        except OSError:  # most likely disconnected
+            self.disconnect()
+            self.request_rescan()
+            self.frames_dropped += 1
+            return False
 
-        b = open(blue_path, 'w')
-        b.write(str(blue))
-        b.close()
+        return True
 
     def loop(self, data):
         """
         Function that will be repeatedly called by a threadloop.
 
         :param data: 2d array containing a list of rgb values for the target device
+        :return: whether the color was written
         """
 
         # we get a list of rgb values which only contains one entry (since there is only one LED), so we grab that
-        self.set_dualshock_color(data[0])
+        return self.set_dualshock_color(data[0])
+
+    def close(self):
+        self.disconnect()
+        super().close()
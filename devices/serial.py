@@ -10,25 +10,77 @@ __all__ = [
 
 
 class Serial(Device):
+    bits_per_byte = 10  # 8N1: start bit, 8 data bits, stop bit
 
     def __init__(self, device, *args, **kwargs):
         super().__init__(device, *args, **kwargs)
 
         path = device.get('path')
+        baud = device.get('baud')
+        self.framing = device.get('framing')
+        self.serial_device = None
+
+        if self.framing not in (None, 'adalight'):
+            print(f'WARNING: Serial device "{self.name}" has an unknown framing "{self.framing}", sending raw data.')
+            self.framing = None
 
         try:
-            self.serial_device = serial.Serial(path, device.get('baud'))
+            self.serial_device = serial.Serial(path, baud, write_timeout=device.get('write_timeout'))
         except serial.serialutil.SerialException:
             print(f'WARNING: Serial device path "{path}" invalid. Disabling it.')
             self.enabled = False
 
+        self.allocate_buffer(self.leds)
+
+        self.max_fps = baud / (self.bits_per_byte * len(self.buffer))
+        if 1000 / self.frame_sleep > self.max_fps:
+            print(f'WARNING: Serial device "{self.name}" can do at most {round(self.max_fps, 1)} FPS '
+                  f'with {baud} baud and {self.leds} LEDs.')
+
+    def allocate_buffer(self, leds):
+        """
+        preallocates the whole frame, including the Adalight header ("Ada", LED count - 1, checksum) if enabled
+        """
+        if self.framing == 'adalight':
+            count_high, count_low = (leds - 1).to_bytes(2, 'big')
+            header = b'Ada' + bytes([count_high, count_low, count_high ^ count_low ^ 0x55])
+        else:
+            header = b''
+
+        self.buffer = bytearray(header) + bytearray(leds * 3)
+        self.payload = np.frombuffer(self.buffer, dtype=np.uint8, offset=len(header)).reshape([leds, 3])
+
     def set_serial_strip(self, data):
         """
-        Sends an array of colors to a Serial device
+        Sends an array of colors to a Serial device.
+        Frames are dropped while the previous one is still waiting to be sent, instead of queueing up.
         :param data: the color value in rgb
+        :return: whether the frame was written
         """
-        byte_data = bytes(np.array(data).ravel().tolist())
-        self.serial_device.write(byte_data)
+        try:
+            if self.serial_device.out_waiting:
+                self.frames_dropped += 1
+                return False
+        except (OSError, serial.serialutil.SerialException):
+            pass  # not every platform or port can report its output buffer
+
+        if len(data) != len(self.payload):
+            self.allocate_buffer(len(data))
+
+        np.copyto(self.payload, data, casting='unsafe')
+
+        try:
+            self.serial_device.write(self.buffer)
+        except serial.serialutil.SerialTimeoutException:
+            self.frames_dropped += 1
+            return False
+
+        return True
 
     def loop(self, data):
-        self.set_serial_strip(data)
+        return self.set_serial_strip(data)
+
+    def close(self):
+        super().close()
+        if self.serial_device is not None:
+            self.serial_device.close()
@@ -1,5 +1,7 @@
 import socket
 
+import numpy as np
+
 from .device import Device
 
 
@@ -9,18 +11,118 @@ __all__ = [
 
 
 class WLED(Device):
-    
+    realtime_timeout = 5  # seconds until WLED returns to its own effects after the last packet
+
+    # most LEDs a single datagram can hold, see https://kno.wled.ge/interfaces/udp-realtime/
+    drgb_max_leds = 490
+    dnrgb_max_leds = 489
+
+    blocking_send = False
+
     def __init__(self, device, *args, **kwargs):
         super().__init__(device, *args, **kwargs)
-        
+
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)  # a full socket buffer drops the packet rather than stalling the loop
         self.ip = device.get('ip')
         self.port = device.get('port')
+        self.partial_updates = device.get('partial_updates', False)
+
+        self.drgb_header = bytes([2, self.realtime_timeout])
+        self.dnrgb_header = bytearray([4, self.realtime_timeout, 0, 0])
+        self.allocate_payload(self.leds)
+
+    def allocate_payload(self, leds):
+        """
+        preallocates the rgb bytes of all LEDs. Packets are sent straight from slices of it, behind their header.
+        """
+        self.payload = np.zeros([leds, 3], dtype=np.uint8)
+        self.payload_bytes = memoryview(self.payload).cast('B')
+        self.payload_sent = False
+
+        # which channels and LEDs changed, for partial_updates
+        self.changed_channels = np.zeros([leds, 3], dtype=bool)
+        self.changed_leds = np.zeros(leds, dtype=bool)
+
+    def send_packet(self, header, start, end):
+        """
+        :return: False if the socket's buffer is full and the packet was dropped
+        """
+        payload = self.payload_bytes[start * 3:end * 3]
+
+        try:
+            if hasattr(self.sock, 'sendmsg'):
+                self.sock.sendmsg([header, payload], [], 0, (self.ip, self.port))
+            else:  # Windows has no scatter/gather send
+                self.sock.sendto(header + payload, (self.ip, self.port))
+        except BlockingIOError:
+            return False
+
+        return True
+
+    def send_dnrgb(self, start, end):
+        """
+        sends LEDs start to end (exclusive) in as few DNRGB packets as possible
+
+        :return: whether all of them were sent
+        """
+        sent = True
+
+        for chunk_start in range(start, end, self.dnrgb_max_leds):
+            chunk_end = min(chunk_start + self.dnrgb_max_leds, end)
+            self.dnrgb_header[2:4] = chunk_start.to_bytes(2, 'big')
+            sent = self.send_packet(self.dnrgb_header, chunk_start, chunk_end) and sent
+
+        return sent
 
     def set_wled_strip(self, data):
-        byte_data = bytes([2, 5, *data.ravel().astype(int).tolist()])
+        """
+        Sends an array of colors to a WLED device. Strips with more LEDs than a DRGB packet can hold
+        are split into DNRGB packets. With partial_updates, only the LED ranges that changed are sent.
+
+        :param data: 2d array containing a list of rgb values
+        :return: whether every packet was sent, otherwise the frame counts as dropped
+        """
+        leds = len(data)
+        if leds != len(self.payload):
+            self.allocate_payload(leds)
+
+        partial = self.partial_updates and self.payload_sent
+        if partial:
+            np.not_equal(self.payload, data, out=self.changed_channels)
+            np.any(self.changed_channels, axis=1, out=self.changed_leds)
+            partial = self.changed_leds[self.changed_leds.argmax()]
+
+        np.copyto(self.payload, data, casting='unsafe')
 
-        self.sock.sendto(byte_data, (self.ip, self.port))
+        if not partial:  # unchanged frames are keepalives, those are sent as a whole
+            if leds <= self.drgb_max_leds:
+                sent = self.send_packet(self.drgb_header, 0, leds)
+            else:
+                sent = self.send_dnrgb(0, leds)
+        else:
+            sent = True
+
+            # every packet starts at the next changed LED and ends at the last changed one it can hold
+            start = int(self.changed_leds.argmax())
+            while start < leds:
+                window = self.changed_leds[start:start + self.dnrgb_max_leds]
+                sent = self.send_dnrgb(start, start + len(window) - int(window[::-1].argmax())) and sent
+
+                rest = self.changed_leds[start + self.dnrgb_max_leds:]
+                first = int(rest.argmax()) if len(rest) else 0
+                start = start + self.dnrgb_max_leds + first if len(rest) and rest[first] else leds
+
+        # after a dropped packet, WLED doesn't show what the payload holds, so the next frame is sent as a whole
+        self.payload_sent = sent
+        if not sent:
+            self.frames_dropped += 1
+
+        return sent
 
     def loop(self, data):
-        self.set_wled_strip(data)
+        return self.set_wled_strip(data)
+
+    def close(self):
+        super().close()
+        self.sock.close()
@@ -0,0 +1,260 @@
+import ast
+import importlib
+import json
+import os
+
+
+__all__ = ['FXModeInfo', 'discover_fxmodes', 'load_fxmode']
+
+
+CACHE_VERSION = 1
+
+
+class FXModeInfo:
+    """
+    what's known about an fxmode without importing it
+    """
+
+    def __init__(self, name, package, target_versions=None, target_platforms=None):
+        self.name = name
+        self.package = package  # directory in fxmodes/
+        self.target_versions = target_versions
+        self.target_platforms = target_platforms
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'package': self.package,
+            'target_versions': self.target_versions,
+            'target_platforms': self.target_platforms,
+        }
+
+    def __repr__(self):
+        return f'<FXModeInfo {self.name} in {self.package}>'
+
+
+def literal(node):
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return None
+
+
+def scan_classes(tree):
+    """
+    :return: dict of class name: (names of its bases, dict of its literal class attributes)
+    """
+    classes = {}
+
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            attributes = {}
+
+            for statement in node.body:
+                if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+                    target = statement.targets[0]
+                    if isinstance(target, ast.Name):
+                        attributes[target.id] = literal(statement.value)
+
+            bases = [base.id for base in node.bases if isinstance(base, ast.Name)]
+            classes[node.name] = (bases, attributes)
+
+    return classes
+
+
+def class_attribute(classes, class_name, attribute):
+    """
+    looks the attribute up in the class and its bases, as far as they're defined in the same file
+    """
+    while class_name in classes:
+        bases, attributes = classes[class_name]
+
+        if attribute in attributes:
+            return attributes[attribute]
+
+        class_name = bases[0] if bases else None
+
+    return None
+
+
+def scan_package(package_path, package):
+    """
+    reads the modes of an fxmode package from the syntax trees of its __init__.py and the modules it imports them from,
+    which works as long as `modes` is a plain list of classes and their attributes are plain values.
+
+    :return: list of FXModeInfo and the files they were read from, or None if it can't be figured out that way
+    """
+    init_path = os.path.join(package_path, '__init__.py')
+
+    with open(init_path) as file:
+        tree = ast.parse(file.read(), init_path)
+
+    imported_from = {}  # class name: module file
+    mode_names = None
+
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.level == 1 and node.module:
+            for alias in node.names:
+                imported_from[alias.asname or alias.name] = (
+                    os.path.join(package_path, *node.module.split('.')) + '.py', alias.name,
+                )
+
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == 'modes' for target in node.targets
+        ):
+            if not isinstance(node.value, (ast.List, ast.Tuple)):
+                return None
+            if not all(isinstance(element, ast.Name) for element in node.value.elts):
+                return None
+
+            mode_names = [element.id for element in node.value.elts]
+
+    if mode_names is None:
+        return None
+
+    modes = []
+    files = {init_path}
+    parsed = {init_path: scan_classes(tree)}
+
+    for mode_name in mode_names:
+        if mode_name in parsed[init_path]:  # defined in __init__.py itself
+            module_path, class_name = init_path, mode_name
+        elif mode_name in imported_from:
+            module_path, class_name = imported_from[mode_name]
+        else:
+            return None
+
+        if module_path not in parsed:
+            if not os.path.isfile(module_path):
+                return None
+
+            with open(module_path) as file:
+                parsed[module_path] = scan_classes(ast.parse(file.read(), module_path))
+            files.add(module_path)
+
+        classes = parsed[module_path]
+        name = class_attribute(classes, class_name, 'name')
+
+        if not isinstance(name, str):
+            return None
+
+        modes.append(FXModeInfo(
+            name,
+            package,
+            target_versions=class_attribute(classes, class_name, 'target_versions'),
+            target_platforms=class_attribute(classes, class_name, 'target_platforms'),
+        ))
+
+    return modes, files
+
+
+def import_package(package):
+    """
+    the fallback for packages scan_package() can't figure out: importing them
+
+    :return: list of FXModeInfo
+    """
+    modes = getattr(importlib.import_module(f'fxmodes.{package}'), 'modes')
+
+    return [
+        FXModeInfo(mode.name, package, target_versions=mode.target_versions, target_platforms=mode.target_platforms)
+        for mode in modes
+    ]
+
+
+def file_mtimes(files):
+    return {path: os.stat(path).st_mtime_ns for path in files}
+
+
+def discover_fxmodes(fxmode_path, cache_path=None):
+    """
+    finds the modes of all fxmode packages in fxmode_path without importing them, so startup doesn't pay
+    for the dependencies of every installed fxmode. Packages are read either from a fxmode.json manifest
+    ({"modes": [{"name": ..., "target_versions": [...], "target_platforms": [...]}]}), or from the syntax trees of
+    their code. The results are cached in cache_path and reused as long as none of the files they came from changed.
+    Packages that can't be read that way are imported, like they used to be.
+
+    :return: dict of mode name: FXModeInfo
+    """
+    cache = {}
+    if cache_path:
+        try:
+            with open(cache_path) as file:
+                cache = json.load(file)
+            if cache.get('version') != CACHE_VERSION:
+                cache = {}
+        except (OSError, ValueError):
+            cache = {}
+
+    cached_packages = cache.get('packages', {})
+    packages = {}
+    available_fxmodes = {}
+
+    for package in sorted(os.listdir(fxmode_path)):
+        package_path = os.path.join(fxmode_path, package)
+
+        if not os.path.isfile(os.path.join(package_path, '__init__.py')):
+            continue
+
+        cached = cached_packages.get(package)
+        try:
+            unchanged = cached and file_mtimes(cached['files']) == cached['files']
+        except OSError:
+            unchanged = False
+
+        if unchanged:
+            modes = [FXModeInfo(**mode) for mode in cached['modes']]
+            packages[package] = cached
+        else:
+            manifest_path = os.path.join(package_path, 'fxmode.json')
+
+            try:
+                if os.path.isfile(manifest_path):
+                    with open(manifest_path) as file:
+                        manifest = json.load(file)
+
+                    modes = [FXModeInfo(package=package, **mode) for mode in manifest['modes']]
+                    files = {manifest_path}
+                else:
+                    modes, files = scan_package(package_path, package) or (None, None)
+            except (OSError, SyntaxError, ValueError, KeyError, TypeError) as error:
+                print(f'WARNING: couldn\'t read the fxmode {package} ({error}), skipping it.')
+                continue
+
+            if modes is None:
+                try:
+                    modes = import_package(package)
+                except (ImportError, AttributeError) as error:
+                    print(f'WARNING: couldn\'t load the fxmode {package} ({error}), skipping it.')
+                    continue
+            else:  # imported packages are never cached, since their modes may change without their files changing
+                packages[package] = {
+                    'files': file_mtimes(files),
+                    'modes': [mode.as_dict() for mode in modes],
+                }
+
+        for mode in modes:
+            available_fxmodes[mode.name] = mode
+
+    if cache_path and packages != cached_packages:
+        try:
+            with open(cache_path, 'w') as file:
+                json.dump({'version': CACHE_VERSION, 'packages': packages}, file, indent=2)
+        except OSError:
+            pass
+
+    return available_fxmodes
+
+
+def load_fxmode(info):
+    """
+    imports the package of an fxmode and returns its class. Import errors are raised,
+    so missing dependencies of the selected fxmode are reported instead of hiding it.
+    """
+    modes = getattr(importlib.import_module(f'fxmodes.{info.package}'), 'modes')
+
+    for mode in modes:
+        if mode.name == info.name:
+            return mode
+
+    raise LookupError(f'the fxmode {info.package} doesn\'t provide "{info.name}" (anymore)')
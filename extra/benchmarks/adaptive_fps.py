@@ -0,0 +1,103 @@
+"""
+Overloads the host on purpose and compares how the loops cope with and without adaptive_fps.
+
+Every device's device_processing spins for --work-ms while holding the GIL, which is more than a single core can do
+at the configured rates. The run has three phases: light load, heavy load and light load again, so both throttling
+and ramping back up show. Reported per phase are the achieved FPS of the data loop and of the devices by priority,
+along with the data loop's jitter.
+"""
+import argparse
+import os
+import sys
+from time import perf_counter_ns, sleep
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from fakes import SyntheticFX, WLEDReceiver, launch_arguments, neutral_colors  # noqa: E402
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-n', '--devices', help='amount of devices, priorities alternate 0 and 1', type=int, default=6)
+parser.add_argument('-f', '--fps', help='configured FPS of the devices', type=int, default=60)
+parser.add_argument('--data-fps', help='configured FPS of the data loop', type=int, default=60)
+parser.add_argument('-w', '--work-ms', help='device_processing time per frame under heavy load', type=float, default=4)
+parser.add_argument('-p', '--phase', help='seconds per phase', type=float, default=8)
+args = parser.parse_args()
+
+
+class OverloadFX(SyntheticFX):
+    name = 'Overload Benchmark'
+    share_device_processing = False  # every device should do its own work
+
+    work_ns = 0
+
+    def device_processing(self, device, device_instance):
+        end = perf_counter_ns() + self.work_ns
+        while perf_counter_ns() < end:
+            pass
+
+        return super().device_processing(device, device_instance)
+
+
+def run(adaptive):
+    sinks = [WLEDReceiver(None) for _ in range(args.devices)]
+    devices = {
+        f'wled-{index}': {
+            'type': 'wled', 'ip': '127.0.0.1', 'port': sink.port, 'leds': 60, 'fps': args.fps,
+            'priority': index % 2, **neutral_colors,
+        } for index, sink in enumerate(sinks)
+    }
+    config = {'data_fps': args.data_fps, 'adaptive_fps': adaptive, 'devices': devices}
+
+    fxmode = OverloadFX(core_version='dev', config=config, launch_arguments=launch_arguments, source_leds=60)
+    for sink in sinks:
+        sink.fxmode = fxmode
+
+    loops = [('data', fxmode.data_metrics), *fxmode.devices_metrics.items()]
+    phases = []
+
+    try:
+        fxmode.start_threads()
+
+        for phase, work_ms in (('light', 0), ('heavy', args.work_ms), ('light again', 0)):
+            fxmode.work_ns = int(work_ms * 1_000_000)
+
+            before = {name: metrics.frames for name, metrics in loops}
+            lateness_before = fxmode.data_metrics.index
+            sleep(args.phase)
+            after = {name: metrics.frames for name, metrics in loops}
+
+            # lateness of the data frames of this phase, from the ring buffer of LoopMetrics
+            count = min(after['data'] - before['data'], len(fxmode.data_metrics.lateness))
+            lateness = np.roll(fxmode.data_metrics.lateness, -lateness_before)[:count]
+
+            rates = {name: (after[name] - before[name]) / args.phase for name in after}
+            phases.append({
+                'phase': phase,
+                'data_fps': rates['data'],
+                'data_jitter_ms': float(lateness.mean()) if lateness.size else 0,
+                'priority_0_fps': np.mean([rates[name] for name in devices if devices[name]['priority'] == 0]),
+                'priority_1_fps': np.mean([rates[name] for name in devices if devices[name]['priority'] == 1]),
+                'adapted': {name: round(controller.fps, 1) for name, controller in fxmode.devices_controllers.items()},
+            })
+    finally:
+        fxmode.kill()
+        for sink in sinks:
+            sink.close()
+
+    return phases
+
+
+for adaptive in (False, True):
+    print(f'adaptive_fps={adaptive}')
+
+    for phase in run(adaptive):
+        adapted = ', '.join(f'{fps:g}' for fps in phase['adapted'].values())
+        print(
+            f'  {phase["phase"]:<12} data {phase["data_fps"]:5.1f} FPS (jitter {phase["data_jitter_ms"]:6.2f} ms), '
+            f'devices priority 0: {phase["priority_0_fps"]:5.1f} FPS, priority 1: {phase["priority_1_fps"]:5.1f} FPS'
+            + (f', adapted to [{adapted}]' if adaptive else '')
+        )
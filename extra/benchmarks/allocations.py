@@ -0,0 +1,137 @@
+"""
+Checks with tracemalloc that the device hot path (Core.device_tick: processing, interpolation, color correction,
+flip, change detection and the transports) doesn't allocate arrays per frame.
+
+The fxmode returns preallocated frames from device_processing, so whatever shows up was allocated by ImmersiveFX.
+For every tick, the peak of traced memory above what was allocated before it is taken: a single frame-sized
+temporary array (3 bytes per LED at least) would push it way past --limit, while the small Python objects every
+tick creates (timestamps, views, ...) stay below. Exits with 1 if any variant exceeds it or memory keeps growing.
+
+pyserial's write() copies every frame into bytes, twice if the port only takes part of it, which isn't up to
+ImmersiveFX. Serial devices are allowed that much on top.
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from fakes import FakeSysfs, SyntheticFX, launch_arguments, neutral_colors  # noqa: E402
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-l', '--leds', help='LEDs per device', type=int, default=5000)
+parser.add_argument('-n', '--frames', help='measured data frames per variant', type=int, default=200)
+parser.add_argument('--limit', help='bytes a tick may allocate temporarily', type=int, default=4096)
+args = parser.parse_args()
+
+variants = {
+    'neutral': neutral_colors,
+    'color tables': {'brightness': 0.8, 'color_temperature': 5600, 'gamma': 2.2, 'non_linear_brightness': False},
+    'enhancements': {'saturation': 1.3, 'non_linear_brightness': True},
+    'flip': {'flip': True},
+    'change_tolerance': {'change_tolerance': 3},
+    'linear interpolation': {'interpolation': 'linear'},
+    'ema interpolation': {'interpolation': 'ema', 'smoothing': 50},
+    'partial_updates': {'partial_updates': True},
+}
+
+
+class AllocationFX(SyntheticFX):
+    name = 'Allocation Check'
+
+    def __init__(self, *fxmode_args, **kwargs):
+        super().__init__(*fxmode_args, **kwargs)
+
+        rng = np.random.default_rng(0)
+        self.device_frames = {
+            name: [rng.uniform(0, 255, [device.get('leds', 1), 3]) for _ in range(2)]
+            for name, device in self.devices.items()
+        }
+
+    def device_processing(self, device, device_instance):
+        return self.device_frames[device_instance.name][self.frames.sequence % 2]
+
+
+def drain(read):
+    while True:
+        try:
+            read()
+        except OSError:
+            break
+
+
+receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+receiver.bind(('127.0.0.1', 0))
+threading.Thread(target=drain, args=[lambda: receiver.recv(65535)], daemon=True).start()
+
+master, slave = os.openpty()
+threading.Thread(target=drain, args=[lambda: os.read(master, 65535)], daemon=True).start()
+
+sysfs = FakeSysfs(1)
+
+
+def run(overrides):
+    devices = {
+        'wled': {'type': 'wled', 'ip': '127.0.0.1', 'port': receiver.getsockname()[1], 'leds': args.leds},
+        'serial': {'type': 'serial', 'path': os.ttyname(slave), 'baud': 10_000_000, 'leds': args.leds},
+        'dualshock': {'type': 'dualshock', 'device_num': 1},
+    }
+    for device in devices.values():
+        device.update(keepalive=0, **overrides)  # keepalive 0 sends every frame
+
+    fxmode = AllocationFX(core_version='dev', config={'devices': devices}, launch_arguments=launch_arguments)
+    fxmode.open_devices()
+    instances = list(fxmode.device_instances.values())
+
+    peaks = {instance.name: 0 for instance in instances}
+    allowed = {instance.name: args.limit + 2 * len(getattr(instance, 'buffer', b'')) for instance in instances}
+    growth = 0
+
+    try:
+        for frame in range(-20 - args.frames, 0):  # the first 20 are warmup, buffers get allocated there
+            fxmode.data_tick()
+
+            for tick in range(2):  # the second one has the same data frame, or an interpolated one
+                for instance in instances:
+                    tracemalloc.reset_peak()
+                    before, _ = tracemalloc.get_traced_memory()
+
+                    fxmode.device_tick(instance)
+
+                    current, peak = tracemalloc.get_traced_memory()
+                    if frame >= -args.frames:
+                        peaks[instance.name] = max(peaks[instance.name], peak - before)
+                        growth += current - before
+    finally:
+        fxmode.close_devices()
+
+    return peaks, allowed, growth
+
+
+tracemalloc.start()
+failed = False
+
+try:
+    print(f'{args.leds} LEDs, {args.frames} data frames, bytes allocated temporarily per tick at most:')
+
+    for label, overrides in variants.items():
+        peaks, allowed, growth = run(overrides)
+        exceeded = any(peaks[name] > allowed[name] for name in peaks) or growth > args.limit
+        failed = failed or exceeded
+
+        print(
+            f'  {label:<22}' + ', '.join(f'{name} {peak:>6}' for name, peak in peaks.items())
+            + f', total growth {growth:>6}' + (' FAILED' if exceeded else '')
+        )
+finally:
+    tracemalloc.stop()
+    sysfs.close()
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,138 @@
+"""
+Compares the old per-frame device construction with the persistent device instances of Core.device_loop.
+
+Syscall-ish operations are counted with an audit hook (sys.addaudithook), so this runs without strace or hardware.
+WLED sends to a local UDP socket, Serial writes into a pty and DualShock writes into a fake sysfs tree.
+"""
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+from argparse import Namespace
+from collections import Counter
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from devices import DualShock  # noqa: E402
+from immersivefx import Core  # noqa: E402
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-n', '--frames', help='frames to send per run', type=int, default=600)
+parser.add_argument('-l', '--leds', help='LEDs per device', type=int, default=64)
+args = parser.parse_args()
+
+AUDITED_EVENTS = {
+    'open', 'os.listdir', 'os.scandir', 'glob.glob', 'fcntl.ioctl', 'fcntl.fcntl',
+    'socket.__new__', 'socket.bind', 'socket.sendto',
+}
+
+counter = Counter()
+counting = False
+
+
+def audit_hook(event, _):
+    if counting and event in AUDITED_EVENTS:
+        counter[event] += 1
+
+
+sys.addaudithook(audit_hook)
+
+
+def drain(read):
+    while True:
+        try:
+            read()
+        except OSError:
+            break
+
+
+class LifecycleBenchmark(Core):
+    name = 'Lifecycle Benchmark'
+    target_versions = ['dev']
+    target_platforms = ['all']
+
+    def splash(self):
+        pass
+
+    def device_processing(self, device, device_instance):
+        return np.full([device_instance.leds, 3], 127)
+
+
+def legacy_frame(core, device_name):
+    """
+    what Core.device_loop did before: a new device instance for every single frame
+    """
+    device = core.devices[device_name]
+    instance = core.device_classes[device['type']](device, device_name)
+
+    data = np.array(core.device_processing(device, instance)).clip(0, 255)
+    data = instance.apply_enhancements(data * instance.brightness * instance.color_temperature).astype(int)
+    instance.loop(data)
+
+    # instances keep their transports open nowadays, the DualShock ones would run out of file descriptors otherwise
+    instance.close()
+
+
+def run(core, frame):
+    global counting
+
+    counter.clear()
+    counting = True
+    start = perf_counter()
+
+    for _ in range(args.frames):
+        for device_name in core.devices:
+            frame(core, device_name)
+
+    duration = perf_counter() - start
+    counting = False
+
+    return duration, dict(counter)
+
+
+receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+receiver.bind(('127.0.0.1', 0))
+threading.Thread(target=drain, args=[lambda: receiver.recv(65535)], daemon=True).start()
+
+master, slave = os.openpty()
+threading.Thread(target=drain, args=[lambda: os.read(master, 65535)], daemon=True).start()
+
+sysfs = tempfile.mkdtemp()
+for channel in ('global', 'red', 'green', 'blue'):
+    os.makedirs(os.path.join(sysfs, f'0005:054C:05C4.0001:{channel}'))
+    open(os.path.join(sysfs, f'0005:054C:05C4.0001:{channel}', 'brightness'), 'w').close()
+DualShock.sysfs_pattern = os.path.join(sysfs, '0005:054C:05C4.*:global')
+DualShock.rescan()
+
+core = LifecycleBenchmark(
+    core_version='dev',
+    config={
+        'devices': {  # keepalive 0 sends every frame, even though they are all the same
+            'wled': {
+                'type': 'wled', 'ip': '127.0.0.1', 'port': receiver.getsockname()[1], 'leds': args.leds, 'keepalive': 0,
+            },
+            'serial': {'type': 'serial', 'path': os.ttyname(slave), 'leds': args.leds, 'keepalive': 0},
+            'dualshock': {'type': 'dualshock', 'device_num': 1, 'keepalive': 0},
+        },
+    },
+    launch_arguments=Namespace(no_version_check=True, no_platform_check=True, single_threaded=True),
+)
+
+results = {'per-frame construction': run(core, legacy_frame)}
+
+core.open_devices()
+results['persistent instances'] = run(core, lambda fx, device_name: fx.device_loop(device_name))
+core.close_devices()
+
+print(f'{args.frames} frames, {len(core.devices)} devices, {args.leds} LEDs each')
+for label, (duration, events) in results.items():
+    per_frame = sum(events.values()) / args.frames
+    print(f'{label}: {per_frame:.1f} audited calls per frame, {duration / args.frames * 1000:.3f} ms per frame')
+    for event, count in sorted(events.items()):
+        print(f'    {event}: {count / args.frames:.1f}')
@@ -0,0 +1,61 @@
+"""
+Compares the array based Device.apply_enhancements with the previous per-pixel colorsys implementation
+and checks that both produce the same output within rounding.
+"""
+import argparse
+import colorsys
+import os
+import sys
+from timeit import Timer
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from devices.device import Device  # noqa: E402
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-s', '--saturation', help='saturation setting of the device', type=float, default=1.3)
+parser.add_argument('-r', '--repeat', help='timing repetitions, the best one is reported', type=int, default=5)
+args = parser.parse_args()
+
+
+def colorsys_enhancements(device, data):
+    """
+    the implementation Device.apply_enhancements used before, kept as reference
+    """
+    if device.non_linear_brightness:
+        new_values = np.array([colorsys.rgb_to_hsv(*value) for value in data]) ** [1, 1, 2]
+        new_values = new_values * [1, device.saturation, 0.00390625]
+    else:
+        new_values = np.array([colorsys.rgb_to_hsv(*value) for value in data]) * [1, device.saturation, 1]
+
+    return np.array([colorsys.hsv_to_rgb(*value) for value in new_values]).clip(0, 255)
+
+
+def best_of(function, data):
+    timer = Timer(lambda: function(data))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=args.repeat, number=number)) / number * 1000
+
+
+rng = np.random.default_rng(0)
+
+for non_linear_brightness in (True, False):
+    device = Device({'saturation': args.saturation, 'non_linear_brightness': non_linear_brightness}, 'benchmark')
+    print(f'non_linear_brightness={non_linear_brightness}, saturation={args.saturation}')
+
+    for leds in (60, 300, 1000, 5000):
+        data = rng.uniform(0, 255, [leds, 3])
+
+        expected = colorsys_enhancements(device, data)
+        difference = np.abs(device.apply_enhancements(data) - expected).max()
+
+        old = best_of(lambda frame: colorsys_enhancements(device, frame), data)
+        new = best_of(device.apply_enhancements, data)
+
+        print(
+            f'{leds:>5} LEDs: colorsys {old:8.3f} ms, array {new:6.3f} ms, '
+            f'{old / new:6.1f}x faster, max difference {difference:.2e}'
+        )
@@ -0,0 +1,210 @@
+"""
+Stand-ins for real hardware, so ImmersiveFX can be measured headless:
+
+- WLEDReceiver: loopback UDP socket decoding DRGB and DNRGB packets
+- SerialSink: pty pair reading Adalight framed data
+- FakeSysfs: temporary directory with the /sys/class/leds/...:global layout DualShock looks for
+- SyntheticFX: fxmode that encodes the data frame sequence number into the first LED, so sinks can tell latency
+"""
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from argparse import Namespace
+from time import perf_counter_ns
+
+import numpy as np
+
+from devices import DualShock
+from immersivefx import Core
+
+
+__all__ = ['WLEDReceiver', 'SerialSink', 'FakeSysfs', 'SyntheticFX', 'launch_arguments', 'neutral_colors']
+
+
+launch_arguments = Namespace(
+    no_version_check=True,
+    no_platform_check=True,
+    single_threaded=False,
+    display_frametimes=False,
+)
+
+# device settings that leave the frame untouched, so the encoded sequence numbers survive color correction
+neutral_colors = {
+    'brightness': 1,
+    'saturation': 1,
+    'gamma': 1,
+    'non_linear_brightness': False,
+}
+
+
+def decode_sequence(rgb):
+    red, green, blue = rgb
+    return (red << 16) | (green << 8) | blue
+
+
+class Sink:
+    """
+    common bookkeeping: received frames and latencies (in ms) of the first LED's sequence number
+    """
+
+    def __init__(self, fxmode):
+        self.fxmode = fxmode
+        self.frames = 0
+        self.latencies = []
+        self.running = True
+
+    def received(self, first_led):
+        received_at = perf_counter_ns()
+        published_at = self.fxmode.published.get(decode_sequence(first_led))
+
+        self.frames += 1
+        if published_at:
+            self.latencies.append((received_at - published_at) / 1_000_000)
+
+    def reset(self):
+        self.frames = 0
+        self.latencies = []
+
+
+class WLEDReceiver(Sink):
+
+    def __init__(self, fxmode):
+        super().__init__(fxmode)
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+
+        self.packets = 0
+        self.thread = threading.Thread(target=self.receive, daemon=True)
+        self.thread.start()
+
+    def receive(self):
+        buffer = bytearray(65536)
+
+        while self.running:
+            try:
+                size = self.sock.recv_into(buffer)
+            except (socket.timeout, OSError):
+                continue
+
+            self.packets += 1
+            protocol = buffer[0]
+
+            if protocol == 2:  # DRGB: [2, timeout, rgb...]
+                self.received(buffer[2:5])
+            elif protocol == 4 and size > 4:  # DNRGB: [4, timeout, start high, start low, rgb...]
+                if int.from_bytes(buffer[2:4], 'big') == 0:
+                    self.received(buffer[4:7])
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.sock.close()
+
+
+class SerialSink(Sink):
+
+    def __init__(self, fxmode, leds):
+        super().__init__(fxmode)
+
+        self.master, self.slave = os.openpty()
+        self.path = os.ttyname(self.slave)
+        count_high, count_low = (leds - 1).to_bytes(2, 'big')
+        self.header = b'Ada' + bytes([count_high, count_low, count_high ^ count_low ^ 0x55])
+        self.frame_size = len(self.header) + leds * 3
+
+        self.thread = threading.Thread(target=self.receive, daemon=True)
+        self.thread.start()
+
+    def receive(self):
+        pending = bytearray()
+
+        while self.running:
+            try:
+                pending += os.read(self.master, 65536)
+            except OSError:
+                break
+
+            while True:
+                start = pending.find(self.header)
+                if start < 0 or len(pending) - start < self.frame_size:
+                    break
+
+                self.received(pending[start + 6:start + 9])
+                del pending[:start + self.frame_size]
+
+    def close(self):
+        self.running = False
+        os.close(self.slave)
+        os.close(self.master)
+
+
+class FakeSysfs:
+    """
+    creates controllers 1 to count and points DualShock at them
+    """
+
+    def __init__(self, count):
+        self.path = tempfile.mkdtemp(prefix='immersivefx-sysfs-')
+        self.original_pattern = DualShock.sysfs_pattern
+
+        for device_num in range(1, count + 1):
+            base = os.path.join(self.path, f'0005:054C:05C4.{device_num:04X}:')
+            for channel in ('global', 'red', 'green', 'blue'):
+                os.makedirs(base + channel)
+                with open(os.path.join(base + channel, 'brightness'), 'w') as file:
+                    file.write('0')
+
+        DualShock.sysfs_pattern = os.path.join(self.path, '0005:054C:05C4.*:global')
+        DualShock.rescan()
+
+    def close(self):
+        DualShock.sysfs_pattern = self.original_pattern
+        DualShock.rescan()
+        shutil.rmtree(self.path)
+
+
+class SyntheticFX(Core):
+    """
+    moving gradient (or the frames of a recording, see recording.py), with the sequence number of the data frame
+    in the first LED
+    """
+    name = 'Synthetic Benchmark'
+    target_versions = ['dev']
+    target_platforms = ['all']
+
+    def __init__(self, *args, source_leds=300, recording=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.published = {}
+        self.recording = recording
+        self.gradient = np.linspace(0, 255, source_leds * 3).reshape([source_leds, 3])
+        self.raw_data = self.gradient.copy()
+
+    def splash(self):
+        pass
+
+    def data_processing(self, *args, **kwargs):
+        sequence = self.frames.sequence + 1
+
+        if self.recording:
+            frame = np.array(self.recording[sequence % len(self.recording)], dtype=np.float64).reshape([-1, 3])
+        else:
+            frame = np.roll(self.gradient, sequence, axis=0)
+        frame[0] = [(sequence >> 16) & 255, (sequence >> 8) & 255, sequence & 255]
+
+        self.raw_data = frame
+        self.published[sequence] = perf_counter_ns()
+        self.published.pop(sequence - 1000, None)
+
+    def device_processing(self, device, device_instance):
+        frame = self.raw_data
+        indices = np.linspace(0, len(frame) - 1, device_instance.leds).astype(int)
+        indices[0] = 0
+
+        return frame[indices]
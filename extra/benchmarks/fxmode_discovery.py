@@ -0,0 +1,123 @@
+"""
+Compares the startup cost of finding fxmodes: importing every fxmode package (what main.py used to do)
+against discovery.discover_fxmodes, once without and once with its cache, followed by importing only the selected one.
+
+Every run is a fresh interpreter with -X importtime. A fake fxmodes directory is used, along with the real
+Replay fxmode as the selected one. The fake fxmodes import some stdlib modules and a dependency taking
+--dependency-ms to import, standing in for screen capture, PulseAudio or FFT libraries which aren't installed here.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-n', '--fxmodes', help='amount of fake fxmodes', type=int, default=6)
+parser.add_argument('-m', '--dependency-ms', help='import time of each fake dependency', type=int, default=100)
+parser.add_argument('-r', '--runs', help='runs per variant, the fastest is shown', type=int, default=5)
+args = parser.parse_args()
+
+HEAVY_IMPORTS = [
+    'asyncio', 'http.server', 'xml.dom.minidom', 'email.mime.multipart', 'decimal', 'sqlite3', 'unittest', 'numpy',
+]
+
+DEPENDENCY = '''
+from time import sleep
+
+sleep({seconds})
+'''
+
+FXMODE_MAIN = '''
+import {heavy}
+
+import fake_dependency_{index}
+
+from immersivefx import Core
+
+
+class Fake{index}(Core):
+    name = 'Fake {index}'
+    target_versions = ['1.2']
+    target_platforms = ['all']
+'''
+
+FXMODE_INIT = '''
+from .main import Fake{index}
+
+modes = [
+    Fake{index},
+]
+'''
+
+EAGER = '''
+import os
+for fxmode in os.listdir('fxmodes'):
+    try:
+        modes = getattr(__import__(f'fxmodes.{fxmode}', globals(), locals(), [fxmode]), 'modes')
+    except (ModuleNotFoundError, AttributeError):
+        continue
+'''
+
+LAZY = '''
+from discovery import discover_fxmodes, load_fxmode
+fxmodes = discover_fxmodes('fxmodes', cache_path={cache_path!r})
+load_fxmode(fxmodes['Replay'])
+'''
+
+
+def measure(code, directory):
+    """
+    :return: wall time in ms, import time in ms and the amount of imported modules
+    """
+    environment = {**os.environ, 'PYTHONPATH': os.pathsep.join([root, directory])}
+
+    start = perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=directory, env=environment, capture_output=True, text=True, check=True,
+    )
+    wall = (perf_counter() - start) * 1000
+
+    # lines look like "import time:       123 |        456 | module", self and cumulative in µs
+    lines = [line.split('|') for line in result.stderr.splitlines() if line.startswith('import time:') and '|' in line]
+    modules = [line for line in lines if line[0].split(':')[1].strip().isdigit()]
+
+    return wall, sum(int(line[0].split(':')[1]) for line in modules) / 1000, len(modules)
+
+
+directory = tempfile.mkdtemp(prefix='immersivefx-discovery-')
+try:
+    fxmodes = os.path.join(directory, 'fxmodes')
+    shutil.copytree(os.path.join(root, 'fxmodes', 'Replay'), os.path.join(fxmodes, 'Replay'))
+
+    for index in range(args.fxmodes):
+        package = os.path.join(fxmodes, f'Fake{index}')
+        os.makedirs(package)
+
+        with open(os.path.join(package, '__init__.py'), 'w') as file:
+            file.write(FXMODE_INIT.format(index=index))
+        with open(os.path.join(package, 'main.py'), 'w') as file:
+            file.write(FXMODE_MAIN.format(index=index, heavy=HEAVY_IMPORTS[index % len(HEAVY_IMPORTS)]))
+        with open(os.path.join(directory, f'fake_dependency_{index}.py'), 'w') as file:
+            file.write(DEPENDENCY.format(seconds=args.dependency_ms / 1000))
+
+    cache_path = os.path.join(directory, '.fxmodes-cache.json')
+    variants = {
+        'import all fxmodes': EAGER,
+        'discovery, no cache': LAZY.format(cache_path=None),
+        'discovery, cached': LAZY.format(cache_path=cache_path),
+    }
+
+    measure(variants['discovery, cached'], directory)  # fills the cache
+
+    print(f'{args.fxmodes + 1} fxmodes, fastest of {args.runs} runs')
+    for label, code in variants.items():
+        wall, imports, modules = min(measure(code, directory) for _ in range(args.runs))
+        print(f'{label}: {wall:.1f} ms total, {imports:.1f} ms importing {modules} modules')
+finally:
+    shutil.rmtree(directory)
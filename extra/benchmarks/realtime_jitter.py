@@ -0,0 +1,123 @@
+"""
+Measures how late the data and device loops wake up and how long their frames take (collections pause whatever
+thread is running), with and without the realtime settings.
+
+Two kinds of interference are simulated:
+- garbage collection: the fxmode holds --live-objects objects and keeps a short history of what it allocates
+  per frame, so the cyclic collector regularly has to walk all of them, which pauses every thread
+- scheduling: --hogs processes burn CPU next to ImmersiveFX, so the loops have to win the core back to run on time
+
+Realtime runs use realtime_policy --policy (nice needs root or CAP_SYS_NICE for negative values,
+fifo needs it anyway) and pin the data and device threads to --cores if given.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from collections import deque
+from time import sleep
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from fakes import SyntheticFX, WLEDReceiver, launch_arguments, neutral_colors  # noqa: E402
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-n', '--devices', help='amount of devices', type=int, default=4)
+parser.add_argument('-f', '--fps', help='FPS of the data loop and the devices', type=int, default=60)
+parser.add_argument('-d', '--duration', help='seconds per run', type=float, default=15)
+parser.add_argument('--live-objects', help='objects the fxmode keeps alive', type=int, default=1_000_000)
+parser.add_argument('--allocations', help='objects the fxmode allocates per frame', type=int, default=2000)
+parser.add_argument('--hogs', help='processes burning CPU alongside', type=int, default=1)
+parser.add_argument('--policy', help='realtime_policy of the realtime runs', choices=('nice', 'fifo'), default='nice')
+parser.add_argument('--cores', help='realtime_data_cores and realtime_device_cores', type=int, nargs='+')
+args = parser.parse_args()
+
+
+class GarbageFX(SyntheticFX):
+    name = 'Garbage Benchmark'
+
+    def __init__(self, *fxmode_args, **kwargs):
+        super().__init__(*fxmode_args, **kwargs)
+
+        self.live = [{'index': index} for index in range(args.live_objects)]
+        self.history = deque(maxlen=30)  # survives a few collections, so it makes it into the older generations
+
+    def data_processing(self, *fxmode_args, **kwargs):
+        self.history.append([{'frame': self.frames.sequence, 'index': index} for index in range(args.allocations)])
+        super().data_processing(*fxmode_args, **kwargs)
+
+
+def hog():
+    while True:
+        pass
+
+
+def percentiles(values):
+    return [round(float(value), 3) for value in np.percentile(values, [50, 99, 100])] if values.size else [0, 0, 0]
+
+
+def run(realtime):
+    sinks = [WLEDReceiver(None) for _ in range(args.devices)]
+    devices = {
+        f'wled-{index}': {
+            'type': 'wled', 'ip': '127.0.0.1', 'port': sink.port, 'leds': 60, **neutral_colors,
+        } for index, sink in enumerate(sinks)
+    }
+    config = {
+        'data_fps': args.fps,
+        'device_fps': args.fps,
+        'adaptive_fps': False,  # keeps the rates the same for both runs
+        'realtime': realtime,
+        'realtime_policy': args.policy,
+        'realtime_data_cores': args.cores,
+        'realtime_device_cores': args.cores,
+        'devices': devices,
+    }
+
+    fxmode = GarbageFX(core_version='dev', config=config, launch_arguments=launch_arguments, source_leds=60)
+    for sink in sinks:
+        sink.fxmode = fxmode
+
+    hogs = [multiprocessing.Process(target=hog, daemon=True) for _ in range(args.hogs)]
+
+    try:
+        for process in hogs:
+            process.start()
+
+        fxmode.start_threads()
+        sleep(1)
+
+        for metrics in [fxmode.data_metrics, *fxmode.devices_metrics.values()]:
+            metrics.count = 0  # forgets the lateness of the warmup
+            metrics.index = 0
+
+        sleep(args.duration)
+
+        data_metrics = fxmode.data_metrics
+        devices_metrics = list(fxmode.devices_metrics.values())
+
+        results = {
+            'data lateness': data_metrics.lateness[:data_metrics.count].copy(),
+            'data frame time': data_metrics.durations[:data_metrics.count].copy(),
+            'device lateness': np.concatenate([metrics.lateness[:metrics.count] for metrics in devices_metrics]),
+            'device frame time': np.concatenate([metrics.durations[:metrics.count] for metrics in devices_metrics]),
+        }
+    finally:
+        fxmode.kill()
+        for process in hogs:
+            process.terminate()
+        for sink in sinks:
+            sink.close()
+
+    return {name: percentiles(values) for name, values in results.items()}
+
+
+for realtime in (False, True):
+    print(f'realtime={realtime}, p50/p99/max in ms')
+
+    for name, (p50, p99, maximum) in run(realtime).items():
+        print(f'  {name:<18} {p50:8.3f} {p99:8.3f} {maximum:8.3f}')
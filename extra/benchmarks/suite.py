@@ -0,0 +1,139 @@
+"""
+Headless benchmark suite: runs SyntheticFX against fake WLED, Serial and DualShock endpoints (see fakes.py)
+for every combination of LED count, device count and FPS, and reports achieved FPS, CPU time per frame
+and the latency from data frame publication to arrival at the fake device.
+
+Results are printed as a table and written as JSON (or CSV if the output ends in .csv), so runs can be compared.
+
+    python extra/benchmarks/suite.py --leds 60 300 1000 --devices 1 8 --fps 30 60 --types wled serial
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+from time import process_time, sleep, strftime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from fakes import FakeSysfs, SerialSink, SyntheticFX, WLEDReceiver, launch_arguments, neutral_colors  # noqa: E402
+from recording import Recording  # noqa: E402
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-l', '--leds', help='LEDs per device', type=int, nargs='+', default=[60, 300, 1000])
+parser.add_argument('-d', '--devices', help='devices per type', type=int, nargs='+', default=[1, 4])
+parser.add_argument('-f', '--fps', help='device and data FPS', type=int, nargs='+', default=[30, 60])
+parser.add_argument('-t', '--types', help='device types', nargs='+', default=['wled', 'serial', 'dualshock'],
+                    choices=['wled', 'serial', 'dualshock'])
+parser.add_argument('-s', '--scheduler', help='scheduler to use', default='threads', choices=['threads', 'asyncio'])
+parser.add_argument('-r', '--replay', help='use the frames of a recording (see main.py --record) as input')
+parser.add_argument('--duration', help='seconds to measure per run', type=float, default=3)
+parser.add_argument('--warmup', help='seconds to run before measuring', type=float, default=0.5)
+parser.add_argument('-o', '--output', help='result file, .json or .csv', default=f'benchmark-{strftime("%Y%m%d-%H%M%S")}.json')
+args = parser.parse_args()
+
+
+def run(leds, device_count, fps):
+    sinks = {}
+    devices = {}
+    sysfs = None
+
+    # endpoints have to exist before the devices open them, they learn about the fxmode right after
+    for index in range(device_count):
+        if 'wled' in args.types:
+            sinks[f'wled-{index}'] = WLEDReceiver(None)
+            devices[f'wled-{index}'] = {
+                'type': 'wled', 'ip': '127.0.0.1', 'port': sinks[f'wled-{index}'].port, 'leds': leds, **neutral_colors,
+            }
+
+        if 'serial' in args.types:
+            sinks[f'serial-{index}'] = SerialSink(None, leds)
+            devices[f'serial-{index}'] = {
+                'type': 'serial', 'path': sinks[f'serial-{index}'].path, 'leds': leds, 'baud': 4_000_000,
+                'framing': 'adalight', **neutral_colors,
+            }
+
+        if 'dualshock' in args.types:
+            devices[f'dualshock-{index}'] = {'type': 'dualshock', 'device_num': index + 1, **neutral_colors}
+
+    if 'dualshock' in args.types:
+        sysfs = FakeSysfs(device_count)
+
+    config = {'fps': fps, 'scheduler': args.scheduler, 'devices': devices}
+
+    fxmode = SyntheticFX(
+        core_version='dev', config=config, launch_arguments=launch_arguments, source_leds=leds, recording=recording,
+    )
+    for sink in sinks.values():
+        sink.fxmode = fxmode
+
+    try:
+        fxmode.start_threads()
+        sleep(args.warmup)
+
+        for sink in sinks.values():
+            sink.reset()
+        frames_before = {name: metrics.frames for name, metrics in fxmode.devices_metrics.items()}
+        cpu_before = process_time()
+
+        sleep(args.duration)
+
+        cpu = process_time() - cpu_before
+        device_frames = {
+            name: metrics.frames - frames_before[name] for name, metrics in fxmode.devices_metrics.items()
+        }
+    finally:
+        fxmode.kill()
+        for sink in sinks.values():
+            sink.close()
+        if sysfs:
+            sysfs.close()
+
+    latencies = np.array([latency for sink in sinks.values() for latency in sink.latencies])
+    total_frames = sum(device_frames.values())
+    received = sum(sink.frames for sink in sinks.values())
+
+    return {
+        'leds': leds,
+        'devices': len(devices),
+        'fps': fps,
+        'achieved_fps': round(total_frames / len(devices) / args.duration, 2),
+        'received_fps': round(received / len(sinks) / args.duration, 2) if sinks else None,
+        'cpu_ms_per_frame': round(cpu * 1000 / total_frames, 4) if total_frames else None,
+        'cpu_percent': round(cpu / args.duration * 100, 1),
+        'latency_p50_ms': round(float(np.percentile(latencies, 50)), 3) if latencies.size else None,
+        'latency_p99_ms': round(float(np.percentile(latencies, 99)), 3) if latencies.size else None,
+    }
+
+
+recording = Recording(args.replay) if args.replay else None
+
+results = []
+for leds in args.leds:
+    for device_count in args.devices:
+        for fps in args.fps:
+            result = run(leds, device_count, fps)
+            results.append(result)
+            print(', '.join(f'{key}: {value}' for key, value in result.items()))
+
+if args.output.endswith('.csv'):
+    with open(args.output, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=results[0].keys())
+        writer.writeheader()
+        writer.writerows(results)
+else:
+    with open(args.output, 'w') as file:
+        json.dump({
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count(),
+            'arguments': vars(args),
+            'results': results,
+        }, file, indent=2)
+
+print(f'results written to {args.output}')
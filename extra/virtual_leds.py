@@ -1,14 +1,27 @@
+"""
+Stands in for one or more WLED devices and shows what they would display, one strip per port.
+
+Understands the DRGB and DNRGB realtime protocols, so strips of any length work. Packets are decoded by a receiving
+thread per port, drawing happens at most --fps times per second and only for strips that received something new.
+Below each strip, the received packets per second and the receive-to-draw latency are shown.
+
+    python extra/virtual_leds.py -p 21324 21325 21326
+"""
 import argparse
 import socket
 import sys
 import threading
-from tkinter import Tk, Canvas
+from time import perf_counter
+from tkinter import Tk, Canvas, PhotoImage
+
+import numpy as np
 
 parser = argparse.ArgumentParser()
 
 parser.add_argument('-x', '--width', help='canvas width in pixels', default=320)
-parser.add_argument('-y', '--height', help='canvas height in pixels', default=40)
-parser.add_argument('-p', '--port', help='port, this script is listening on', default=21324)
+parser.add_argument('-y', '--height', help='strip height in pixels', default=40)
+parser.add_argument('-p', '--port', help='ports this script is listening on, one strip each', nargs='+', default=[21324])
+parser.add_argument('-f', '--fps', help='maximum redraws per second', default=60)
 
 
 args = parser.parse_args()
@@ -16,62 +29,145 @@ args = parser.parse_args()
 try:
     width = int(args.width)
     height = int(args.height)
-    port = int(args.port)
+    ports = [int(port) for port in args.port]
+    fps = int(args.fps)
 except ValueError:
     print('ERROR: Arguments need to be passed as numbers', file=sys.stderr)
     exit(1)
 
+DRGB = 2
+DNRGB = 4
+
+HEX = [f'{value:02x}' for value in range(256)]
+LABEL_HEIGHT = 18
 
-class Data:
+
+class Strip:
+    """
+    receives and decodes the packets of a single port
+    """
 
     def __init__(self, port):
         self.port = port
 
-        self.pixels = 1
-        self.processed = [[0, 0, 0]]
+        self.leds = 0
+        self.colors = np.zeros([490, 3], dtype=np.uint8)
+        self.changed = False
+        self.received_at = 0
+
+        self.packets = 0
+        self.packets_per_second = 0
+        self.latency = 0
 
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
         self.sock.bind(('', port))
 
-        threading.Thread(target=self.update_data).start()
+        threading.Thread(target=self.update_data, daemon=True).start()
+
+    def set_colors(self, start, data):
+        end = start + len(data) // 3
+
+        if end > len(self.colors):
+            colors = np.zeros([max(end, len(self.colors) * 2), 3], dtype=np.uint8)
+            colors[:len(self.colors)] = self.colors
+            self.colors = colors
+
+        self.colors[start:end] = np.frombuffer(data, dtype=np.uint8, count=(end - start) * 3).reshape([-1, 3])
+
+        return end
 
     def update_data(self):
+        buffer = bytearray(65536)
+        view = memoryview(buffer)
+
         while True:
-            message, *_ = self.sock.recvfrom(1024)
-            data = list(message)[2:]
-            self.pixels = int(len(data) / 3)
-            self.processed = [
-                [data[pixel * 3 + subpixel] for subpixel in range(3)]
-                for pixel in range(self.pixels)
-            ]
+            size = self.sock.recv_into(buffer)
+            protocol = buffer[0]
+
+            if protocol == DRGB:  # [2, timeout, rgb...]
+                self.leds = self.set_colors(0, view[2:size])
+            elif protocol == DNRGB and size >= 4:  # [4, timeout, start index high, start index low, rgb...]
+                start = int.from_bytes(buffer[2:4], 'big')
+                self.leds = max(self.leds, self.set_colors(start, view[4:size]))
+            else:
+                continue
+
+            self.packets += 1
+            self.received_at = perf_counter()
+            self.changed = True
+
+
+class StripView:
+    """
+    draws a Strip as a single PhotoImage row that is stretched over the canvas width and tiled over the height
+    """
+
+    def __init__(self, canvas, strip, top):
+        self.canvas = canvas
+        self.strip = strip
 
+        self.image = PhotoImage(width=width, height=height)
+        canvas.create_image(0, top, image=self.image, anchor='nw')
+        self.label = canvas.create_text(4, top + height + 2, anchor='nw', fill='#ffffff', font=('TkFixedFont', 9))
 
-data = Data(port)
+        self.leds = 0
+        self.pixel_leds = None
 
+    def draw(self):
+        strip = self.strip
+
+        if not strip.changed or not strip.leds:
+            return
+
+        strip.changed = False
+        leds = strip.leds
+
+        if leds != self.leds:  # which LED every pixel of the row shows
+            self.leds = leds
+            self.pixel_leds = (np.arange(width) * leds // width).tolist()
+
+        colors = [f'#{HEX[red]}{HEX[green]}{HEX[blue]}' for red, green, blue in strip.colors[:leds].tolist()]
+        row = ' '.join([colors[led] for led in self.pixel_leds])
+
+        self.image.put(f'{{{row}}}', to=(0, 0, width, height))
+        strip.latency = (perf_counter() - strip.received_at) * 1000
+
+    def update_label(self):
+        strip = self.strip
+
+        self.canvas.itemconfigure(
+            self.label,
+            text=f'port {strip.port}: {strip.leds} LEDs, {strip.packets_per_second} packets/s, '
+                 f'{strip.latency:.1f} ms receive to draw',
+        )
+
+
+strips = [Strip(port) for port in ports]
 
 window = Tk()
 window.title('Virtual LED Strip')
-canvas = Canvas(window, width=width, height=height, bg="#000000")
+canvas = Canvas(window, width=width, height=len(strips) * (height + LABEL_HEIGHT), bg='#000000', highlightthickness=0)
 canvas.pack()
 
+views = [StripView(canvas, strip, index * (height + LABEL_HEIGHT)) for index, strip in enumerate(strips)]
 
-def rgb_to_hex(rgb):
-    return '#%02x%02x%02x' % tuple(rgb)
 
+def render():
+    for view in views:
+        view.draw()
 
-while True:
-    canvas.delete('all')
-    processed = data.processed
-    pixels = data.pixels
+    window.after(max(1, 1000 // fps), render)
 
-    for pixel in range(pixels):
-        hex_color = rgb_to_hex(processed[pixel])
-        canvas.create_rectangle(
-            pixel * width / pixels,
-            0,
-            (pixel + 1) * width / pixels,
-            height,
-            outline=hex_color,
-            fill=hex_color,
-        )
-    canvas.update()
+
+def count_packets():
+    for view in views:
+        view.strip.packets_per_second, view.strip.packets = view.strip.packets, 0
+        view.update_label()
+
+    window.after(1000, count_packets)
+
+
+render()
+count_packets()
+window.mainloop()
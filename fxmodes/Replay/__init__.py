@@ -0,0 +1,6 @@
+from .main import Replay, ReplayFrameByFrame
+
+modes = [
+    Replay,
+    ReplayFrameByFrame,
+]
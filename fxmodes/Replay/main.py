@@ -0,0 +1,86 @@
+from time import perf_counter_ns
+
+import numpy as np
+
+from immersivefx import Core
+from recording import Recording
+
+
+class Replay(Core):
+    """
+    Plays back raw_data recorded with --record (see recording.py), so devices can be tested and profiled
+    without the original screen or audio source. Recordings are expected to be rgb values, like [[r, g, b], ...].
+    For other data, subclass it and use the device_processing of the fxmode it was recorded from.
+    """
+    name = 'Replay'
+
+    target_versions = ['1.2']
+    target_platforms = ['all']
+
+    speed = None  # takes replay_speed from the config if None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        path = self.config.get('replay_path')
+
+        try:
+            self.recording = Recording(path)
+        except (OSError, TypeError, ValueError) as error:
+            print(f'ERROR: can\'t open the recording "{path}" ({error}). Set replay_path in your config.')
+            exit(1)
+
+        if self.speed is None:
+            self.speed = self.config.get('replay_speed', 1)
+        self.loop = self.config.get('replay_loop', True)
+
+        self.position = 0
+        self.started_at = None
+
+        self.raw_data = self.recording[0]
+        self.start_threads()
+
+    def splash(self):
+        print('-------------------')
+        print(' Replay            ')
+        print('-------------------')
+
+    def next_frame(self):
+        """
+        :return: index of the recorded frame to show now
+        """
+        if not self.speed:  # one recorded frame per data frame
+            index = self.position
+            self.position += 1
+        else:
+            now = perf_counter_ns()
+            if self.started_at is None:
+                self.started_at = now
+
+            elapsed = (now - self.started_at) * self.speed
+            if self.loop:
+                elapsed %= self.recording.duration + 1
+
+            index = self.recording.frame_at(elapsed)
+
+        if self.loop:
+            return index % len(self.recording)
+
+        return min(index, len(self.recording) - 1)
+
+    def data_processing(self, *args, **kwargs):
+        self.raw_data = self.recording[self.next_frame()]  # read only view into the recording, no copy
+
+    def device_processing(self, device, device_instance):
+        data = np.asarray(self.raw_data, dtype=np.float32).reshape([-1, 3])
+
+        return self.resample(data, device_instance.leds, 'area' if len(data) > device_instance.leds else 'linear')
+
+
+class ReplayFrameByFrame(Replay):
+    """
+    plays every recorded frame exactly once per data frame, regardless of timing. Meant for benchmarks and profiling
+    """
+    name = 'Replay (frame by frame)'
+
+    speed = 0
@@ -1,24 +1,43 @@
+import json
+import os
 import sys
 import threading
-from time import sleep, time
+from functools import partial
+from time import monotonic, perf_counter_ns, process_time, sleep, time
 
 import numpy as np
 
+from adaptive import FrameRateController
 from devices import WLED, Serial, DualShock
+from metrics import LoopMetrics, MetricsServer
+from pacing import Pacer
+from realtime import RealtimeTuning
+from recording import FrameRecorder
+from resampling import Resampler
+from scheduler import AsyncScheduler
+from shared_frames import DataProcess
+from tracing import FrameTracer
 
 
-__all__ = ['ManagedLoopThread', 'Core']
+__all__ = ['ManagedLoopThread', 'FrameExchange', 'Core']
 
 
 class ManagedLoopThread:
 
-    def __init__(self, target, args=(), kwargs={}):
+    def __init__(self, target, args=(), kwargs={}, setup=None):
+        """
+        :param setup: called once by the thread before it starts looping, like Core.tune_thread
+        """
         self._alive = False
         self._active = False
         self._target = target
+        self._setup = setup
         self._thread = threading.Thread(target=self.loop, args=args, kwargs=kwargs)
 
     def loop(self, *args, **kwargs):
+        if self._setup:
+            self._setup()
+
         while self._alive:
             while self._active:
                 if self._target(*args, **kwargs) != 0:  # if the method returns 0, it ran successfully
@@ -53,6 +72,54 @@ class ManagedLoopThread:
         return self._thread
 
 
+class FrameExchange:
+    """
+    Hands data frames from the data thread to the device threads without locks or copies.
+
+    The producer publishes a finished frame by swapping a single (sequence, frame) reference, which is atomic,
+    so consumers always get a complete frame along with a sequence number that increases with every publish.
+    Consumers compare that number with the one of their last tick to tell whether the frame is new.
+
+    Published frames must not be modified afterwards. Either assign a new object for every frame or
+    write into back_buffer(), which rotates through three arrays (triple buffering).
+    """
+
+    def __init__(self, frame):
+        self._latest = (0, frame)
+        self.published_at = perf_counter_ns()
+        self._buffers = [None, None, None]
+        self._back = 0
+
+    def back_buffer(self, shape, dtype=np.float64):
+        """
+        returns an array that isn't the published frame nor the one before it, to be filled and then published
+        """
+        shape = tuple(np.atleast_1d(shape))
+
+        self._back = (self._back + 1) % len(self._buffers)
+        buffer = self._buffers[self._back]
+
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self._buffers[self._back] = np.zeros(shape, dtype=dtype)
+
+        return buffer
+
+    def publish(self, frame):
+        sequence, _ = self._latest
+        self.published_at = perf_counter_ns()
+        self._latest = (sequence + 1, frame)
+
+    def latest(self):
+        """
+        :return: tuple of the sequence number and the latest published frame
+        """
+        return self._latest
+
+    @property
+    def sequence(self):
+        return self._latest[0]
+
+
 class Core:
     name = 'ImmersiveFX Core'  # override this in your fxmode
 
@@ -60,11 +127,24 @@ class Core:
     target_versions = None  # 'dev' works best for builtin fxmodes, external stuff should name actual versions though
     target_platforms = None  # check https://docs.python.org/3/library/sys.html#sys.platform or use 'all' if it applies
 
+    # device_processing only runs again once there is a new data frame, set this if yours also changes in between
+    reprocess_unchanged_frames = False
+
+    # devices with the same processing_signature() share the processed frame of every data frame,
+    # disable it if your device_processing depends on anything else, like the device name
+    share_device_processing = True
+
+    # device config keys that don't affect what a device displays, so they aren't part of its processing_signature()
+    transport_keys = {
+        'type', 'enabled', 'thread', 'ip', 'port', 'partial_updates', 'path', 'baud', 'framing', 'write_timeout',
+        'device_num', 'fps', 'keepalive', 'change_tolerance', 'align_to_data', 'priority', 'min_fps',
+    }
+
     ##################
     # INITIALIZATION #
     ##################
 
-    def __init__(self, core_version, config, launch_arguments, *args, **kwargs):
+    def __init__(self, core_version, config, launch_arguments, *args, config_path=None, **kwargs):
         """
         fancy little base class, make your fxmode inherit from it to spare yourself unnecessary work
         or don't, I'm a comment not a cop.
@@ -75,34 +155,72 @@ class Core:
         self.check_target(core_version)
 
         self.config = config
+        self.realtime = RealtimeTuning.from_config(config)  # None unless enabled, see tune_thread()
+        self.config_path = config_path  # where config came from, for watch_config
+        self.config_mtime = self.get_config_mtime()
         self.devices = self.parse_devices()
 
         self.management_thread = None
         self.data_thread = None
-
-        self.data_duration = [1]
-        self.devices_duration = {device: [1] for device in self.devices}
+        self.scheduler = None
+        self.data_process = None
+        self.metrics_server = None
+        self.recorder = None
 
         self.device_classes = {
             'wled': WLED,
             'serial': Serial,
             'dualshock': DualShock,
         }
+        self.device_instances = {}
+
+        self.frames = FrameExchange(None)
+        self.device_context = threading.local()
+        self.resampler = Resampler()
+        self.shared_frames = (None, {})  # data frame sequence and processed frames by processing_signature()
+        self.sharing_locks = {}
 
         self.raw_data = np.zeros([1, 3])  # empty, but valid staring point
 
         old_fps = self.config.get('fps', 30)
-        self.data_frame_sleep = 1000 / self.config.get('data_fps', old_fps)
+        self.data_fps = self.config.get('data_fps', old_fps)
+        self.data_frame_sleep = 1000 / self.data_fps
+        self.data_pacer = Pacer(self.data_fps)
+
+        self.data_metrics = LoopMetrics('data', self.data_fps)
+        self.devices_metrics = {device: LoopMetrics(device, config['fps']) for device, config in self.devices.items()}
+
+        # see adapt_frame_rates()
+        self.data_controller = FrameRateController(self.data_fps, self.config.get('data_min_fps'))
+        self.devices_controllers = {
+            device: FrameRateController(config['fps'], config['min_fps'], config['priority'])
+            for device, config in self.devices.items()
+        }
+        self.adapted_at = None
+        self.cpu_time = None
+        self.cpu_load = 0
+        self.calm_seconds = 0
+
+        self.tracer = FrameTracer(
+            size=self.config.get('trace_spans', 65536),
+            enabled=self.config.get('tracing', False),
+        )
 
         self.splash()
 
-    def parse_devices(self):
+    def parse_devices(self, config=None, exit_on_error=True):
         """
         reads config.json and configures everything according to it. This method only takes care of the basics,
         so you may wanna extend it if your fxmode takes/requires additional settings.
         See fxmodes/screenfx/main.py for a reference implementation
+
+        :param config: the config to read the devices from, self.config if None
+        :param exit_on_error: exits if there's no usable device, otherwise raises a ValueError (see reload())
         :return:
         """
+        if config is None:
+            config = self.config
+
         #  These keys need to be set per device, everything else has some kinda default instead
         required_keys = {
             'wled': {'ip', 'leds'},
@@ -113,9 +231,12 @@ class Core:
         # Here we'll put the final configurations
         final_devices = {}
 
-        devices = self.config.get('devices')
+        devices = config.get('devices')
 
         if not devices:
+            if not exit_on_error:
+                raise ValueError('there are no devices in it')
+
             print('You didn\'t define devices in your config, which renders this program kinda useless')
             exit()
 
@@ -138,13 +259,23 @@ class Core:
                                 'flip': device.get('flip', False),
                                 'color_temperature': device.get('color_temperature'),
                                 'saturation': device.get('saturation', 1),
-                                'fps': device.get('fps', self.config.get('device_fps', self.config.get('fps', 30)))
+                                'gamma': device.get('gamma', 1),
+                                'non_linear_brightness': device.get('non_linear_brightness', True),
+                                'change_tolerance': device.get('change_tolerance', 0),
+                                'keepalive': device.get('keepalive', 1),
+                                'align_to_data': device.get('align_to_data', False),
+                                'interpolation': device.get('interpolation'),
+                                'smoothing': device.get('smoothing', 100),
+                                'fps': device.get('fps', config.get('device_fps', config.get('fps', 30))),
+                                'priority': device.get('priority', 0),
+                                'min_fps': device.get('min_fps'),
                             }
 
                             if device_type == 'wled':
                                 device_config = {
                                     'ip': device.get('ip'),
                                     'port': device.get('port', 21324),
+                                    'partial_updates': device.get('partial_updates', False),
                                     'leds': device.get('leds'),
                                     **base_config,
                                 }
@@ -154,6 +285,8 @@ class Core:
                                 device_config = {
                                     'path': device.get('path'),
                                     'baud': baud,
+                                    'framing': device.get('framing'),
+                                    'write_timeout': device.get('write_timeout'),
                                     'leds': device.get('leds'),
                                     **base_config,
                                 }
@@ -164,11 +297,7 @@ class Core:
                                     **base_config,
                                 }
 
-                            device_config['thread'] = ManagedLoopThread(
-                                target=self.device_loop,
-                                args=[name],
-                                kwargs={},
-                            )
+                            device_config['thread'] = self.create_device_thread(name)
 
                             final_devices[name] = device_config
 
@@ -179,12 +308,23 @@ class Core:
                     print(f'WARNING: you didn\'t define the device type for "{name}", skipping it.')
 
         if not final_devices:
+            if not exit_on_error:
+                raise ValueError('none of its devices is enabled and completely configured')
+
             print('ERROR: There\'s no device with complete configuration, please check your config!')
             print('Exiting now...')
             exit(1)
 
         return final_devices
 
+    def create_device_thread(self, device_name):
+        return ManagedLoopThread(
+            target=self.device_loop,
+            args=[device_name],
+            kwargs={},
+            setup=partial(self.tune_thread, 'device'),
+        )
+
     def check_target(self, core_version):
         """
         checks if the user's ImmersiveFX Core version and platform match the fxmode requirements
@@ -216,6 +356,19 @@ class Core:
                 })
                 exit()
 
+    @property
+    def raw_data(self):
+        """
+        inside device_processing this is the frame the device is working on, everywhere else the one
+        data_processing is working on. Each data_loop cycle publishes it to self.frames when it's done.
+        """
+        frame = getattr(self.device_context, 'frame', None)
+        return self._raw_data if frame is None else frame
+
+    @raw_data.setter
+    def raw_data(self, value):
+        self._raw_data = value
+
     def splash(self):
         """
         Override this in your fxmode and print whatever you want. Preferably some kinda logo of course
@@ -237,6 +390,23 @@ class Core:
         initializes and starts data and device threads, call this in your fxmode, usually at the end
         """
 
+        if not self.data_process:
+            self.frames.publish(self._raw_data)  # fxmodes may have replaced the default since __init__
+            self.data_pacer.restart()
+
+            if self.config.get('data_process') and not self.launch_arguments.single_threaded:
+                self.start_data_process()
+        else:
+            self.data_process.start()  # resumes it after stop()
+
+        self.open_devices()
+
+        if self.config.get('metrics_port') and not self.metrics_server:
+            self.start_metrics_server()
+
+        if getattr(self.launch_arguments, 'record', None) and not self.threads_started:
+            self.start_recording(self.launch_arguments.record)
+
         if self.launch_arguments.single_threaded:
             while True:
                 start = time()
@@ -249,13 +419,37 @@ class Core:
                 duration = (time() - start) * 1000
                 print(f'Cycle took {round(duration, 2)}ms')
 
+        elif self.config.get('scheduler') == 'asyncio':
+            if not self.scheduler:
+                self.scheduler = AsyncScheduler(self, workers=self.config.get('workers', 4))
+
+            self.scheduler.start()
+            self.threads_started = True
+
         else:
             self.start_management_thread()
-            self.start_data_thread()
+            if not self.data_process:
+                self.start_data_thread()
             self.start_device_threads()
             self.threads_started = True
 
+        if self.realtime:
+            self.realtime.freeze_gc()  # everything allocated so far stays around anyway
+
+    def tune_thread(self, role):
+        """
+        called by the data and device threads once they're started, applies the realtime settings if enabled
+
+        :param role: 'data' or 'device'
+        """
+        if self.realtime:
+            self.realtime.tune_thread(role)
+
     def start_management_thread(self):
+        if self.management_thread and self.management_thread.alive:
+            self.management_thread.start()  # resumes it after stop()
+            return
+
         self.management_thread = ManagedLoopThread(
             target=self.management_loop,
             args=(),
@@ -264,38 +458,304 @@ class Core:
 
         self.management_thread.start()
 
+    def start_metrics_server(self):
+        self.metrics_server = MetricsServer(
+            self,
+            host=self.config.get('metrics_host', '127.0.0.1'),
+            port=self.config.get('metrics_port'),
+        )
+
+        self.metrics_server.start()
+
+    def start_data_process(self):
+        """
+        moves the data loop into a worker process, which publishes its frames through shared memory.
+        This has to happen before any other thread is started, since only the calling thread survives the fork,
+        and before the devices are opened, so the worker doesn't inherit their serial ports, sockets and sysfs files.
+        """
+        try:
+            self.data_process = DataProcess(self, capacity=self.config.get('shared_frame_bytes'))
+        except ValueError:
+            print('WARNING: data_process needs the fork start method, which isn\'t available on this platform.')
+            print('Running the data loop in a thread instead.')
+            return
+
+        self.frames = self.data_process.ring
+        self.data_process.start()
+
     def start_data_thread(self):
+        if self.data_thread and self.data_thread.alive:
+            self.data_thread.start()  # resumes it after stop()
+            return
+
         self.data_thread = ManagedLoopThread(
             target=self.data_loop,
             args=(),
             kwargs={},
+            setup=partial(self.tune_thread, 'data'),
         )
 
         self.data_thread.start()
 
     def start_device_threads(self):
-        for device, device_config in self.devices.items():
-            thread = device_config.get('thread')
-            if thread:
-                thread.start()
+        for device in self.devices:
+            self.start_device_thread(device)
+
+    def start_device_thread(self, device_name):
+        """
+        starts the thread of a device, or a new one if its loop gave up (like when the device couldn't be opened),
+        since a thread can't be started twice
+        """
+        device_config = self.devices[device_name]
+        thread = device_config.get('thread')
+
+        if thread and thread.thread.ident and not thread.alive:
+            thread = device_config['thread'] = self.create_device_thread(device_name)
+
+        if thread:
+            thread.start()
+
+    def managed_loops(self):
+        """
+        :return: everything that has to be stopped or killed, threads as well as the asyncio scheduler
+        """
+        device_threads = [device_config.get('thread') for device_config in self.devices.values()]
+
+        return [
+            loop for loop in [
+                self.management_thread, self.data_thread, self.data_process, self.scheduler, self.metrics_server,
+                *device_threads,
+            ] if loop
+        ]
 
     def stop(self):
-        self.management_thread.stop()
-        self.data_thread.stop()
+        for loop in self.managed_loops():
+            loop.stop()
 
-        for device, device_config in self.devices.items():
-            thread = device_config.get('thread')
-            if thread:
-                thread.stop()
+        self.close_devices()
 
     def kill(self):
-        self.management_thread.kill()
-        self.data_thread.kill()
+        for loop in self.managed_loops():
+            loop.kill()
+
+        if self.realtime:
+            self.realtime.restore_gc()
+
+        self.close_devices()
+        self.stop_recording()
+
+    def start_recording(self, path):
+        """
+        records every data frame (raw_data) to the directory path, see recording.FrameRecorder.
+        It can be played back with the Replay fxmode.
+
+        :return: whether recording started
+        """
+        if self.data_process:
+            print('WARNING: recording isn\'t available with data_process, the data loop runs in another process.')
+            return False
+
+        self.stop_recording()
+        self.recorder = FrameRecorder(path, chunk_frames=self.config.get('record_chunk_frames', 1024))
+
+        return True
+
+    def stop_recording(self):
+        """
+        :return: the amount of recorded frames
+        """
+        recorder, self.recorder = self.recorder, None
+
+        if not recorder:
+            return 0
+
+        recorder.close()
+
+        return recorder.recorded
+
+    def open_devices(self):
+        """
+        creates a device instance (and therefore its transport, like a socket or serial port) for every device
+        that doesn't have one yet. Instances are reused by every frame until close_devices() is called.
+        """
+        for device_name, device in self.devices.items():
+            if device_name not in self.device_instances:
+                device_class = self.device_classes.get(device.get('type'))
+
+                if device_class:
+                    self.device_instances[device_name] = device_class(device, device_name)
+
+    def close_device(self, device_name):
+        """
+        closes and forgets the instance of a single device, if it has one
+        """
+        instance = self.device_instances.pop(device_name, None)
+
+        if instance:
+            # the lock is held for a whole frame by device_loop, so no frame is sent through a closed transport
+            with instance.lock:
+                instance.close()
+
+    def close_devices(self):
+        """
+        closes all device instances along with their transports. The next start_threads() call opens them again.
+        """
+        for device_name in list(self.device_instances):
+            self.close_device(device_name)
+
+    def reload(self, config):
+        """
+        applies a changed config to the running fxmode without interrupting anything that stayed the same.
+        Color and timing changes are applied to the running device instances, devices with other changes
+        (like their address or LED count) get a new instance, added and removed devices are started and stopped.
+        The fxmode itself and its data loop keep running.
+
+        :param config: the new config, as loaded from config.json
+        :return: dict with lists of 'added', 'removed', 'rebuilt' and 'reconfigured' device names,
+            or None if the config has no usable device, the old one is kept then
+        """
+        try:
+            new_devices = self.parse_devices(config, exit_on_error=False)
+        except ValueError as error:
+            print(f'WARNING: the new config can\'t be applied, {error}. Keeping the old config')
+            return None
+
+        old_config = self.config
+        old_devices = self.devices
+        devices_open = bool(self.device_instances)  # otherwise start_threads() opens them later on
+
+        self.config = config
+
+        changes = {'added': [], 'removed': [], 'rebuilt': [], 'reconfigured': []}
+
+        for device_name, device in new_devices.items():
+            old_device = old_devices.get(device_name)
+
+            if not old_device:
+                changes['added'].append(device_name)
+                continue
+
+            device['thread'] = old_device['thread']  # keeps running, device_loop picks up the new instance
+            changed_keys = {
+                key for key in device.keys() | old_device.keys() if device.get(key) != old_device.get(key)
+            }
+
+            if not changed_keys:
+                continue
+
+            instance = self.device_instances.get(device_name)
+
+            if instance and changed_keys <= instance.configurable_keys:
+                with instance.lock:
+                    instance.configure(device)
+                changes['reconfigured'].append(device_name)
+            else:
+                self.close_device(device_name)
+                if devices_open:
+                    self.device_instances[device_name] = self.device_classes[device['type']](device, device_name)
+                changes['rebuilt'].append(device_name)
+
+        for device_name in old_devices.keys() - new_devices.keys():
+            old_devices[device_name]['thread'].kill()
+            self.close_device(device_name)
+            changes['removed'].append(device_name)
+
+        self.devices = new_devices
+
+        # the management thread and the metrics server iterate over these, so they are replaced instead of changed
+        devices_metrics = dict(self.devices_metrics)
+        devices_controllers = dict(self.devices_controllers)
+
+        for device_name, device in new_devices.items():
+            if device_name in devices_metrics:
+                devices_metrics[device_name].fps = device['fps']
+            else:
+                devices_metrics[device_name] = LoopMetrics(device_name, device['fps'])
+
+            old_device = old_devices.get(device_name)
+            if not old_device or any(device[key] != old_device[key] for key in ('fps', 'min_fps', 'priority')):
+                devices_controllers[device_name] = FrameRateController(
+                    device['fps'], device['min_fps'], device['priority'],
+                )
+
+        self.devices_metrics = devices_metrics
+        self.devices_controllers = devices_controllers
+
+        if devices_open and changes['added']:
+            self.open_devices()
+
+        # rebuilt devices get a new loop if theirs gave up on the old instance, like one that couldn't be opened
+        if devices_open and (changes['added'] or changes['rebuilt']):
+            if self.scheduler:
+                self.scheduler.start_device_tasks_threadsafe()
+            elif self.threads_started:
+                for device_name in changes['added']:
+                    self.start_device_thread(device_name)
+
+                for device_name in changes['rebuilt']:
+                    if not new_devices[device_name]['thread'].alive:
+                        self.start_device_thread(device_name)
+
+        data_fps = config.get('data_fps', config.get('fps', 30))
+        if data_fps != self.data_fps and self.data_process:
+            # the worker process has its own copy of the pacer
+            print('WARNING: changing data_fps only takes effect after a restart with data_process')
+        elif data_fps != self.data_fps:
+            self.data_fps = data_fps
+            self.data_frame_sleep = 1000 / data_fps
+            self.data_pacer.set_fps(data_fps)
+            self.data_metrics.fps = data_fps
+
+        if not self.data_process and (
+            data_fps != old_config.get('data_fps', old_config.get('fps', 30))
+            or config.get('data_min_fps') != old_config.get('data_min_fps')
+        ):
+            self.data_controller.configure(data_fps, config.get('data_min_fps'))
+
+        self.tracer.enabled = config.get('tracing', False)
+
+        if self.realtime:
+            self.realtime.gc_interval = config.get('gc_interval', 60)
+
+        for key in (
+            'fxmode', 'scheduler', 'workers', 'data_process', 'shared_frame_bytes', 'metrics_port', 'realtime',
+            'realtime_data_cores', 'realtime_device_cores', 'realtime_policy', 'realtime_priority', 'realtime_nice',
+        ):
+            if config.get(key) != old_config.get(key):
+                print(f'WARNING: changing {key} only takes effect after a restart')
+
+        return changes
+
+    def get_config_mtime(self):
+        try:
+            return os.stat(self.config_path).st_mtime_ns if self.config_path else None
+        except OSError:
+            return None
+
+    def check_config_file(self):
+        """
+        reloads the config if config_path was modified since it was read last
+        """
+        mtime = self.get_config_mtime()
 
-        for device, device_config in self.devices.items():
-            thread = device_config.get('thread')
-            if thread:
-                thread.kill()
+        if mtime is None or mtime == self.config_mtime:
+            return
+
+        self.config_mtime = mtime
+
+        try:
+            with open(self.config_path) as file:
+                config = json.load(file)
+        except (OSError, ValueError) as error:  # most likely caught mid-save, the next save triggers another try
+            print(f'WARNING: {self.config_path} changed but couldn\'t be read ({error}), keeping the old config')
+            return
+
+        changes = self.reload(config)
+        if changes is None:
+            return
+
+        summary = ', '.join(f'{len(names)} {change}' for change, names in changes.items())
+        print(f'{self.config_path} changed, devices: {summary}')
 
     ######################
     # LOOPS / PROCESSING #
@@ -303,31 +763,218 @@ class Core:
 
     def management_loop(self):
         sleep(1)
+        self.management_processing()
+
+        return 0
+
+    def management_processing(self):
+        """
+        housekeeping done once a second, like displaying frame times
+        """
+        if self.data_process:  # the data loop runs in the other process, only its last frame is known here
+            self.data_metrics.record(self.frames.duration)
+            self.data_metrics.frames = self.frames.sequence
+
+        for loop_metrics in [self.data_metrics, *self.devices_metrics.values()]:
+            loop_metrics.update_rate()
+
+        if self.realtime:
+            self.realtime.collect()
+
+        if self.config.get('adaptive_fps', True) and not self.launch_arguments.single_threaded:
+            self.adapt_frame_rates()
+
+        if self.config.get('watch_config'):
+            self.check_config_file()
+
+        recorder = self.recorder
+        if recorder:
+            recorder.write_manifest()
 
         if self.launch_arguments.display_frametimes:
-            data_duration = round(np.array(self.data_duration or [1]).mean(), 2)
+            metrics = self.metrics()
+
+            def describe(name, summary):
+                adapted_fps = summary.get('adapted_fps', summary['target_fps'])
+                throttled = f'throttled to {round(adapted_fps)}, ' if adapted_fps < summary['target_fps'] else ''
+
+                return (
+                    f'{name}: {round(summary["fps"])}/{summary["target_fps"]} FPS '
+                    f'({throttled}{summary["frame_time_p50_ms"]}/{summary["frame_time_p99_ms"]} ms p50/p99, '
+                    f'jitter {summary["jitter_ms"]} ms)'
+                )
+
             devices_duration = []
 
-            for device, device_config in self.devices.items():
-                if device_config['enabled']:
-                    device_frametime = round(np.array(self.devices_duration[device] or [1]).mean(), 2)
+            for device, summary in metrics['devices'].items():
+                if self.devices[device]['enabled']:
                     devices_duration = [
                         *devices_duration,
-                        f'{device}: {round(1000 / device_frametime)}/{device_config["fps"]} FPS ({device_frametime} ms)'
+                        describe(device, summary) + (
+                            f' [{summary.get("frames_sent_total", 0)} sent, '
+                            f'{summary.get("frames_unchanged_total", 0)} unchanged, '
+                            f'{summary.get("frames_dropped_total", 0)} dropped]'
+                        )
                     ]
 
+                    if summary.get('max_fps'):
+                        devices_duration[-1] += f' (max {round(summary["max_fps"])} FPS)'
+
             print(
                 ' '.join([
-                    '\r'
-                    f'data: {round(1000 / data_duration)}/{self.config.get("data_fps")} FPS ({data_duration} ms)',
+                    '\r' + describe('data', metrics['data']),
                     *devices_duration,
                 ]),
                 end='',
             )
-        self.data_duration = []
-        self.devices_duration = {device: [] for device in self.devices}
 
-        return 0
+    def adapt_frame_rates(self):
+        """
+        lowers the FPS of loops while the host is overloaded and ramps them back up once it isn't anymore,
+        so an overloaded host degrades gracefully instead of every loop fighting for the CPU. Called once a second.
+
+        Nothing is throttled unless a loop blew its budget. If the data loop or several devices blow their budgets,
+        or a single device does while ImmersiveFX uses more than adaptive_cpu_limit of all cores, the host is considered
+        overloaded: the devices with the lowest priority are throttled, and the data loop only once all devices are down
+        to their min_fps.
+        Otherwise, a device blowing its own budget (like a slow serial port) is throttled on its own,
+        it can't keep its rate anyway.
+        After adaptive_recover_after seconds without any loop blowing its budget, the throttled loops with the highest
+        priority (the data loop being the highest) ramp back up by one step per second.
+        See adaptive.FrameRateController.
+        """
+        now = monotonic()
+        cpu_time = process_time()
+        elapsed = now - self.adapted_at if self.adapted_at else 0
+
+        if elapsed:
+            self.cpu_load = (cpu_time - self.cpu_time) / elapsed / (os.cpu_count() or 1)
+        self.adapted_at = now
+        self.cpu_time = cpu_time
+
+        instances = dict(self.device_instances)
+        controllers = {
+            device: controller for device, controller in self.devices_controllers.items() if device in instances
+        }
+
+        overloaded_devices = [
+            device for device, controller in controllers.items() if controller.sample(
+                self.devices_metrics[device].busy, instances[device].pacer.ticks, instances[device].pacer.skipped,
+                elapsed,
+            )
+        ]
+
+        # with data_process, the data loop and its CPU time are in the other process
+        data_overloaded = not self.data_process and self.data_controller.sample(
+            self.data_metrics.busy, self.data_pacer.ticks, self.data_pacer.skipped, elapsed,
+        )
+        # several devices blowing their budgets at once are most likely fighting over the CPU (or the GIL),
+        # which keeps the CPU time of the process below a full core even when it's saturated.
+        # The CPU load only decides whether a single device blowing its budget is slow on its own or starved
+        host_overloaded = (
+            data_overloaded or len(overloaded_devices) > 1
+            or (len(overloaded_devices) == 1 and self.cpu_load > self.config.get('adaptive_cpu_limit', 0.8))
+        )
+
+        if host_overloaded:
+            # the devices blowing their budgets might just be waiting for the CPU, so priority decides
+            candidates = [controller for controller in controllers.values() if controller.can_throttle]
+
+            if candidates:
+                lowest_priority = min(controller.priority for controller in candidates)
+
+                for controller in candidates:
+                    if controller.priority == lowest_priority:
+                        controller.throttle()
+
+            elif not self.data_process and self.data_controller.can_throttle:
+                self.data_controller.throttle()
+        else:
+            for device in overloaded_devices:
+                controllers[device].throttle()
+
+        if overloaded_devices or data_overloaded:
+            self.calm_seconds = 0
+        else:
+            self.calm_seconds += 1
+
+            if self.calm_seconds >= self.config.get('adaptive_recover_after', 3):
+                throttled = [controller for controller in controllers.values() if controller.throttled]
+
+                if self.data_controller.throttled:
+                    self.data_controller.recover()
+                elif throttled:
+                    highest_priority = max(controller.priority for controller in throttled)
+
+                    for controller in throttled:
+                        if controller.priority == highest_priority:
+                            controller.recover()
+
+        # also catches instances that were (re)created with their configured FPS in the meantime
+        for device, controller in controllers.items():
+            if instances[device].pacer.fps != controller.fps:
+                instances[device].pacer.set_fps(controller.fps)
+
+        if not self.data_process and self.data_pacer.fps != self.data_controller.fps:
+            self.data_pacer.set_fps(self.data_controller.fps)
+
+    def trace(self, seconds, path):
+        """
+        records the stages of every frame for the given time and writes them to path, see tracing.FrameTracer.
+        Blocks until done. With tracing enabled in the config, it writes what's already recorded right away.
+
+        :return: the amount of recorded spans
+        """
+        if not self.tracer.enabled:
+            self.tracer.capture(seconds)
+            sleep(seconds)
+
+        return self.tracer.write(path)
+
+    def metrics(self):
+        """
+        collects the metrics of the data loop and all devices, as used by the frame time display and metrics server
+
+        :return: dict with a summary for 'data' and one per device in 'devices'
+        """
+        self.data_metrics.counters = {
+            'deadlines_missed_total': self.data_pacer.skipped,
+            'adapted_fps': round(self.data_controller.fps, 2),
+            'cpu_load': round(self.cpu_load, 3),
+        }
+
+        if self.realtime:
+            self.data_metrics.counters['gc_collection_ms'] = round(self.realtime.collection_ms, 3)
+            self.data_metrics.counters['gc_collections_total'] = self.realtime.collections
+
+        for device, instance in list(self.device_instances.items()):
+            loop_metrics = self.devices_metrics.get(device)
+
+            if loop_metrics:
+                loop_metrics.counters = {
+                    'frames_sent_total': instance.frames_sent,
+                    'frames_unchanged_total': instance.frames_skipped,
+                    'frames_dropped_total': instance.frames_dropped,
+                    'deadlines_missed_total': instance.pacer.skipped,
+                    'processing_shared_total': instance.shared_frames,
+                    'processing_unshared_total': instance.unshared_frames,
+                }
+
+                if instance.max_fps:
+                    loop_metrics.counters['max_fps'] = round(instance.max_fps, 2)
+
+                controller = self.devices_controllers.get(device)
+                if controller:
+                    loop_metrics.counters['adapted_fps'] = round(controller.fps, 2)
+                    loop_metrics.counters['priority'] = controller.priority
+
+        return {
+            'data': self.data_metrics.summary(),
+            'devices': {  # metrics of devices removed by reload() are kept, in case they come back
+                device: loop_metrics.summary()
+                for device, loop_metrics in self.devices_metrics.items() if device in self.devices
+            },
+        }
 
     def data_processing(self, *args, **kwargs):
         """
@@ -335,23 +982,36 @@ class Core:
         """
         pass
 
+    def data_tick(self, *args, **kwargs):
+        """
+        runs data_processing once and publishes the resulting raw_data as a new data frame
+        """
+        start = perf_counter_ns()
+
+        self.data_processing(*args, **kwargs)
+        self.frames.publish(self._raw_data)
+
+        recorder = self.recorder
+        if recorder:
+            recorder.record(self._raw_data, self.frames.published_at)
+
+        if self.tracer.active:
+            track = self.tracer.track('data')
+            self.tracer.record(track, 'data_processing', self.frames.sequence, start, perf_counter_ns())
+
     def data_loop(self, *args, **kwargs):
         """
         Manages data cycle timing, for handling preferably use data_processing
         """
         if self.launch_arguments.single_threaded:
-            self.data_processing()
+            self.data_tick()
         else:
-            start = time()
-
-            self.data_processing(*args, **kwargs)
-
-            duration = (time() - start) * 1000
+            start = perf_counter_ns()
 
-            self.data_duration.append(duration)
+            self.data_tick(*args, **kwargs)
 
-            if duration < self.data_frame_sleep:
-                sleep((self.data_frame_sleep - duration) / 1000)
+            duration = (perf_counter_ns() - start) / 1_000_000
+            self.data_metrics.record(duration, self.data_pacer.wait())
 
         return 0
 
@@ -365,49 +1025,206 @@ class Core:
         """
         return np.zeros([1, 3])
 
-    def device_loop(self, device_name):
+    def resample(self, data, leds, mode='linear'):
         """
-        Thread manager for a device. Creates a class instance for it and runs a continuous loop to send data
+        stretches or shrinks data (along its first axis) to the given amount of LEDs, see resampling.Resampler.
+        Meant for device_processing, like self.resample(self.raw_data, device_instance.leds)
 
-        :param device_name: key to fetch device_config
+        :param data: array of any length, for example one rgb value per screen column
+        :param leds: the amount of values to return
+        :param mode: 'nearest', 'linear' or 'area'
+        :return: numpy array with leds entries
+        """
+        return self.resampler(data, leds, mode)
+
+    def frame_is_new(self, device_instance):
+        """
+        checks if the device needs to run device_processing for the current data frame,
+        or is still interpolating towards it
+        """
+        return (
+            self.frames.sequence != device_instance.frame_sequence
+            or self.reprocess_unchanged_frames
+            or device_instance.interpolating
+        )
+
+    def processing_signature(self, device, device_instance):
+        """
+        describes everything device_processing and color correction depend on, devices with the same one
+        get the same frame. Extend it if your fxmode has device settings in transport_keys that matter.
+
+        :return: a hashable value
+        """
+        settings = {key: value for key, value in device.items() if key not in self.transport_keys}
+
+        return device_instance.leds, json.dumps(settings, sort_keys=True, default=repr)
+
+    def shared_frame(self, signature, sequence):
+        """
+        :return: the frame another device with the same signature processed for the data frame, if there is one
+        """
+        shared_sequence, frames = self.shared_frames
+
+        return frames.get(signature) if shared_sequence == sequence else None
+
+    def share_frame(self, signature, sequence, frame):
+        shared_sequence, frames = self.shared_frames
+
+        if shared_sequence != sequence:  # older frames aren't needed anymore
+            frames = {}
+            self.shared_frames = (sequence, frames)
+
+        frames[signature] = frame
+
+    def process_device(self, device_instance):
+        """
+        runs device_processing and color correction for the latest data frame and stores the result in
+        device_instance.frame, unless that frame was processed already.
+        Devices with the same processing_signature() share that work, only the first one of them does it.
+        Devices with interpolation get a new frame on every tick until they caught up with the data frame.
+        """
+        sequence, frame = self.frames.latest()
+        new_frame = sequence != device_instance.frame_sequence or self.reprocess_unchanged_frames
+
+        if not new_frame and not device_instance.interpolating:
+            return
+
+        device = self.devices.get(device_instance.name)
+
+        # interpolated frames depend on the time of the tick, so they aren't shared
+        sharing = (
+            self.share_device_processing and not self.reprocess_unchanged_frames
+            and not device_instance.interpolation and device is not None
+        )
+
+        if not sharing:
+            device_instance.frame = self.render_device(device, device_instance, sequence, frame, new_frame)
+            device_instance.frame_sequence = sequence
+            return
+
+        if device_instance.signature_config is not device:  # only recomputed after a reload
+            device_instance.signature_config = device
+            device_instance.signature = self.processing_signature(device, device_instance)
+
+        signature = device_instance.signature
+
+        # devices with the same signature wait for the one processing it, instead of doing the same work
+        with self.sharing_locks.setdefault(signature, threading.Lock()):
+            start = perf_counter_ns()
+            data = self.shared_frame(signature, sequence)
+
+            if data is None:
+                data = self.render_device(device, device_instance, sequence, frame, new_frame)
+                self.share_frame(signature, sequence, data)
+                device_instance.unshared_frames += 1
+            else:
+                device_instance.shared_frames += 1
+
+                if self.tracer.active:
+                    track = self.tracer.track(device_instance.name)
+                    self.tracer.record(track, 'device_processing', sequence, start, perf_counter_ns(), shared=True)
+
+        device_instance.frame = data
+        device_instance.frame_sequence = sequence
+
+    def render_device(self, device, device_instance, sequence, frame, new_frame):
+        """
+        the actual work of process_device
+
+        :return: the final frame of the device
         """
-        device = self.devices.get(device_name)
-        device_type = device.get('type')
-        device_class = self.device_classes.get(device_type)
+        start = perf_counter_ns()
 
-        def run_loop(instance):
-            data = np.array(self.device_processing(device, instance)).clip(0, 255)
+        if new_frame:
+            self.device_context.frame = frame
+            try:
+                data = self.device_processing(device, device_instance)
+            finally:
+                self.device_context.frame = None
 
-            data = (instance.apply_enhancements(
-                data * instance.brightness * instance.color_temperature
-            )).astype(int)
+            if device_instance.interpolation:
+                device_instance.set_target(data, self.frames.published_at)
 
-            if instance.flip:
-                data = np.flip(data, axis=0)
+        processed = perf_counter_ns()
 
-            instance.loop(data)
+        if device_instance.interpolation:
+            data = device_instance.interpolate(processed)
+        interpolated = perf_counter_ns()
 
-        if device_class:
-            device_instance = device_class(device, device_name)
+        # just a reversed view, color correction copies it into the device's buffers in order anyway
+        if device_instance.flip:
+            data = np.asarray(data)[::-1]
+        flipped = perf_counter_ns()
 
+        data = device_instance.apply_color_correction(data)
+        corrected = perf_counter_ns()
+
+        if self.tracer.active:
+            track = self.tracer.track(device_instance.name)
+
+            if new_frame:
+                self.tracer.record(track, 'device_processing', sequence, start, processed)
+            if device_instance.interpolation:
+                self.tracer.record(track, 'interpolation', sequence, processed, interpolated)
+            if device_instance.flip:
+                self.tracer.record(track, 'flip', sequence, interpolated, flipped)
+            self.tracer.record(track, 'color_correction', sequence, flipped, corrected)
+
+        return data
+
+    def device_tick(self, device_instance, send=True):
+        """
+        processes (and sends) a single frame of a device
+
+        :param device_instance: device class instance, as created by open_devices()
+        :param send: whether to send the frame as well
+        """
+        # the lock keeps close_devices() from closing the transport mid-frame
+        with device_instance.lock:
+            if device_instance.closed:
+                return
+
+            self.process_device(device_instance)
+
+            if send:
+                start = perf_counter_ns()
+                frames_sent = device_instance.frames_sent
+
+                device_instance.send(device_instance.frame)
+
+                if self.tracer.active:
+                    self.tracer.record(
+                        self.tracer.track(device_instance.name), 'send', device_instance.frame_sequence,
+                        start, perf_counter_ns(), sent=device_instance.frames_sent > frames_sent,
+                    )
+
+    def device_loop(self, device_name):
+        """
+        Thread manager for a device. Runs a continuous loop to send data through the device instance
+        created by open_devices()
+
+        :param device_name: key to fetch device_config
+        """
+        device_instance = self.device_instances.get(device_name)
+
+        if device_instance:
             if self.launch_arguments.single_threaded:
                 if not device_instance.enabled:
                     return None
-                run_loop(device_instance)
+                self.device_tick(device_instance)
 
             else:
                 if not device_instance.enabled:
                     return 1
 
-                start = time()
-
-                run_loop(device_instance)
+                start = perf_counter_ns()
 
-                duration = (time() - start) * 1000
+                self.device_tick(device_instance)
 
-                if duration < device_instance.frame_sleep:
-                    sleep((device_instance.frame_sleep - duration) / 1000)
+                duration = (perf_counter_ns() - start) / 1_000_000
 
-                self.devices_duration[device_name].append(duration)
+                if device_instance.align_to_data:
+                    device_instance.pacer.align(self.frames.published_at)
+                self.devices_metrics[device_name].record(duration, device_instance.pacer.wait())
 
         return 0
@@ -2,8 +2,10 @@ import argparse
 import os
 import sys
 import json
-from time import sleep
+import pprint
+from time import sleep, strftime
 
+from discovery import discover_fxmodes, load_fxmode
 from utils import manage_requirements
 
 
@@ -18,6 +20,7 @@ arg_texts = {
     's': 'skip version check for fxmodes',
     'f': 'displays frame times per thread. Disables available commands while active',
     't': 'single threaded mode. Slow, but useful for testing/debugging',
+    'r': 'records every data frame into this directory, for the Replay fxmode',
 }
 
 parser.add_argument('-d', '--no-deps', help=arg_texts.get('d'), action='store_true')
@@ -25,6 +28,7 @@ parser.add_argument('-p', '--no-platform-check', help=arg_texts.get('p'), action
 parser.add_argument('-s', '--no-version-check', help=arg_texts.get('s'), action='store_true')
 parser.add_argument('-f', '--display-frametimes', help=arg_texts.get('f'), action='store_true')
 parser.add_argument('-t', '--single-threaded', help=arg_texts.get('t'), action='store_true')
+parser.add_argument('-r', '--record', help=arg_texts.get('r'), metavar='DIRECTORY')
 
 args = parser.parse_args()
 
@@ -56,23 +60,12 @@ script_path, *_ = sys.argv
 base_dir = os.path.dirname(script_path)
 fxmode_path = os.path.join(base_dir, 'fxmodes')
 
-available_fxmodes = {}
-
-for fxmode in os.listdir(fxmode_path):
-    try:
-        modes = getattr(__import__(f'fxmodes.{fxmode}', globals(), locals(), [fxmode]), 'modes')
-
-        for mode in modes:
-            available_fxmodes = {
-                **available_fxmodes,
-                mode.name: mode,
-            }
-    except (ModuleNotFoundError, AttributeError):
-        continue
+# only the selected fxmode gets imported, further down
+available_fxmodes = discover_fxmodes(fxmode_path, cache_path=os.path.join(base_dir, '.fxmodes-cache.json'))
 
 
 if not available_fxmodes:
-    print('No valid FXModes found, are the dependencies available (e.g. venv activated)? exiting...')
+    print('No valid FXModes found, did you run `git submodule update --init`? exiting...')
     exit(1)
 
 
@@ -91,10 +84,18 @@ while not selected_fxmode:
     except (IndexError, ValueError):
         print(f'Invalid choice! It must be a number bigger than 0 and smaller than {len(valid_fxmodes)}, try again!')
 
+try:
+    selected_fxmode = load_fxmode(selected_fxmode)
+except (ImportError, LookupError) as error:
+    print(f'The FXMode "{selected_fxmode.name}" couldn\'t be loaded: {error}')
+    print('Are its dependencies installed (e.g. venv activated)? exiting...')
+    exit(1)
+
 fxmode = selected_fxmode(
     core_version=VERSION,
     config=config,
     launch_arguments=args,
+    config_path='config.json',
 )
 
 print('')
@@ -113,7 +114,6 @@ try:
             command = input()
         if command == 'reload':
             print('reloading...')
-            fxmode.stop()
 
             try:
                 with open('config.json') as file:
@@ -122,13 +122,17 @@ try:
                 print('config file not found. you need to place config.json into the main.py directory.')
                 print('There is a config.json.example to use as starting point.')
                 exit()
-
-            fxmode = selected_fxmode(
-                core_version=VERSION,
-                config=config,
-                launch_arguments=args,
-            )
-            print('reload done.')
+            except ValueError as error:
+                print(f'config.json is invalid ({error}), keeping the current config.')
+                config = None
+
+            if config:
+                changes = fxmode.reload(config)
+                if changes is not None:
+                    for change, device_names in changes.items():
+                        if device_names:
+                            print(f'{change}: {", ".join(device_names)}')
+                    print('reload done.')
 
         if command == 'start':
             print('starting threads...')
@@ -140,6 +144,32 @@ try:
             fxmode.stop()
             print('stopped threads.')
 
+        if command == 'metrics':
+            pprint.pprint(fxmode.metrics(), sort_dicts=False)
+
+        if command.startswith('trace'):
+            _, *seconds = command.split()
+            trace_path = f'trace-{strftime("%Y%m%d-%H%M%S")}.json'
+
+            try:
+                seconds = float(seconds[0]) if seconds else 5
+            except ValueError:
+                print('usage: trace [seconds]')
+            else:
+                print(f'tracing for {seconds} seconds...')
+                spans = fxmode.trace(seconds, trace_path)
+                print(f'wrote {spans} spans to {trace_path}')
+
+        if command.startswith('record'):
+            _, *record_path = command.split(maxsplit=1)
+
+            if record_path == ['stop']:
+                print(f'recorded {fxmode.stop_recording()} frames.')
+            else:
+                record_path = record_path[0] if record_path else f'recording-{strftime("%Y%m%d-%H%M%S")}'
+                if fxmode.start_recording(record_path):
+                    print(f'recording to {record_path}, stop it with "record stop".')
+
         if command == 'exit':
             print('exiting...')
             fxmode.kill()
@@ -0,0 +1,152 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic
+
+import numpy as np
+
+
+__all__ = ['LoopMetrics', 'MetricsServer']
+
+
+class LoopMetrics:
+    """
+    Frame metrics of a single loop (the data loop or a device). The last `size` frame times and lateness values
+    are kept in fixed-size ring buffers, so memory doesn't grow no matter how long it runs.
+    record() is called by the loop itself, summary() may be called from any other thread.
+    """
+
+    def __init__(self, name, fps, size=1024):
+        self.name = name
+        self.fps = fps
+
+        self.durations = np.zeros(size)
+        self.lateness = np.zeros(size)
+        self.index = 0
+        self.count = 0
+
+        self.frames = 0
+        self.overruns = 0  # frames that took longer than 1/fps
+        self.busy = 0  # total ms spent in frames
+        self.counters = {}  # further totals, like the sent frames of a device
+
+        self.rate = 0
+        self.rate_frames = 0
+        self.rate_time = monotonic()
+
+        self.lock = threading.Lock()
+
+    def record(self, duration, lateness=0):
+        """
+        :param duration: time the frame took in ms
+        :param lateness: how late the loop woke up for the frame in ms, see Pacer.wait()
+        """
+        with self.lock:
+            self.durations[self.index] = duration
+            self.lateness[self.index] = lateness
+            self.index = (self.index + 1) % len(self.durations)
+            self.count = min(self.count + 1, len(self.durations))
+
+            self.frames += 1
+            self.busy += duration
+            if duration > 1000 / self.fps:
+                self.overruns += 1
+
+    def update_rate(self):
+        """
+        calculates the achieved FPS since the last call, meant to be called about once a second
+        """
+        now = monotonic()
+        self.rate = (self.frames - self.rate_frames) / max(now - self.rate_time, 1e-9)
+        self.rate_frames = self.frames
+        self.rate_time = now
+
+    def summary(self):
+        with self.lock:
+            durations = self.durations[:self.count].copy()
+            lateness = self.lateness[:self.count].copy()
+            frames = self.frames
+            overruns = self.overruns
+
+        p50, p95, p99 = np.percentile(durations, [50, 95, 99]) if durations.size else (0, 0, 0)
+
+        return {
+            'fps': round(self.rate, 2),
+            'target_fps': self.fps,
+            'frame_time_p50_ms': round(float(p50), 3),
+            'frame_time_p95_ms': round(float(p95), 3),
+            'frame_time_p99_ms': round(float(p99), 3),
+            'jitter_ms': round(float(lateness.mean()) if lateness.size else 0, 3),
+            'jitter_max_ms': round(float(lateness.max()) if lateness.size else 0, 3),
+            'frames_total': frames,
+            'overruns_total': overruns,
+            **self.counters,
+        }
+
+
+class MetricsServer:
+    """
+    Serves the metrics of a Core over HTTP, as JSON on /metrics.json and in the Prometheus text format on /metrics.
+    It offers the same start/stop/kill interface as ManagedLoopThread, stop() keeps it serving though.
+    """
+
+    def __init__(self, core, host='127.0.0.1', port=9120):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics.json':
+                    body, content_type = json.dumps(server.core.metrics()), 'application/json'
+                elif self.path == '/metrics':
+                    body, content_type = server.prometheus(), 'text/plain; version=0.0.4'
+                else:
+                    self.send_error(404)
+                    return
+
+                body = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.core = core
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def prometheus(self):
+        metrics = self.core.metrics()
+        loops = [('data', 'data', metrics['data'])] + [
+            ('device', name, summary) for name, summary in metrics['devices'].items()
+        ]
+
+        lines = []
+        for key in dict.fromkeys(key for *_, summary in loops for key in summary):
+            name = f'immersivefx_{key}'
+            lines.append(f'# TYPE {name} {"counter" if key.endswith("_total") else "gauge"}')
+
+            for kind, loop, summary in loops:
+                if key in summary:
+                    lines.append(f'{name}{{kind="{kind}",loop="{loop}"}} {summary[key]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def start(self):
+        if not self._thread.ident:
+            self._thread.start()
+
+    def stop(self):
+        pass
+
+    def kill(self):
+        if self._thread.ident:
+            self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def thread(self):
+        return self._thread
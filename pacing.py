@@ -0,0 +1,109 @@
+import asyncio
+from time import perf_counter_ns, sleep
+
+
+__all__ = ['Pacer']
+
+
+class Pacer:
+    """
+    Paces a loop to absolute deadlines on the monotonic perf_counter_ns clock, one every 1/fps seconds.
+    Since deadlines don't depend on how long a frame took, scheduling errors don't add up.
+
+    The bulk of the wait is slept, the last spin_ns are spent yielding in a loop as sleep() tends to oversleep.
+    If a frame overruns its deadline(s), the missed ones are skipped instead of being run back to back.
+    align() shifts the deadlines onto the phase of another loop, like the data loop publishing frames.
+    """
+    spin_ns = 500_000
+
+    def __init__(self, fps):
+        self.period = None
+        self.set_fps(fps)
+
+        self.deadline = None
+        self.anchor = None
+        self.aligned_to = None
+
+        self.ticks = 0
+        self.skipped = 0  # deadlines missed because a frame overran
+
+    def restart(self):
+        """
+        forgets the last deadline, for example after the loop was stopped for a while
+        """
+        self.deadline = None
+        self.anchor = None
+
+    def set_fps(self, fps):
+        self.fps = fps
+        self.period = int(1_000_000_000 / fps)
+
+    def align(self, timestamp_ns, lead_ns=None):
+        """
+        makes the following deadlines fall lead_ns after timestamp_ns, plus a multiple of the period
+        """
+        if timestamp_ns != self.aligned_to:
+            self.aligned_to = timestamp_ns
+            self.anchor = timestamp_ns + (self.spin_ns if lead_ns is None else lead_ns)
+
+    def advance(self):
+        """
+        moves on to the next deadline, skipping the ones that already passed
+
+        :return: the new deadline in ns
+        """
+        now = perf_counter_ns()
+
+        if self.deadline is None:  # the first frame just ran
+            self.deadline = now
+
+        deadline = self.deadline + self.period
+
+        # only move onto the aligned grid if ticks are off by more than a quarter period,
+        # otherwise every bit of jitter of the other loop would cause an extra short frame
+        if self.anchor is not None and (deadline - self.anchor) % self.period > self.period // 4:
+            deadline = self.anchor + ((self.deadline - self.anchor) // self.period + 1) * self.period
+        self.anchor = None
+
+        if deadline <= now:
+            missed = (now - deadline) // self.period + 1
+            self.skipped += missed
+            deadline += missed * self.period
+
+        self.deadline = deadline
+        return deadline
+
+    def record(self, deadline):
+        """
+        :return: how late the loop woke up for the deadline, in ms
+        """
+        self.ticks += 1
+        return max(perf_counter_ns() - deadline, 0) / 1_000_000
+
+    def wait(self):
+        """
+        blocks until the next deadline
+
+        :return: how late it woke up, in ms
+        """
+        deadline = self.advance()
+        remaining = deadline - perf_counter_ns()
+
+        if remaining > self.spin_ns:
+            sleep((remaining - self.spin_ns) / 1_000_000_000)
+
+        while perf_counter_ns() < deadline:
+            sleep(0)  # yields the GIL, unlike a bare spin
+
+        return self.record(deadline)
+
+    async def wait_async(self):
+        """
+        waits for the next deadline without blocking the event loop, so there's no spinning
+
+        :return: how late it woke up, in ms
+        """
+        deadline = self.advance()
+        await asyncio.sleep(max(deadline - perf_counter_ns(), 0) / 1_000_000_000)
+
+        return self.record(deadline)
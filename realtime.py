@@ -0,0 +1,162 @@
+import gc
+import os
+import threading
+from time import monotonic, perf_counter_ns
+
+
+__all__ = ['RealtimeTuning']
+
+
+class RealtimeTuning:
+    """
+    Opt-in tuning against jitter, configured with the realtime_* keys (see README). Two things get in the way of
+    frames leaving on time: the OS scheduler running something else on the core a loop wants to wake up on,
+    and Python's cyclic garbage collector pausing every thread at whatever moment allocations cross its threshold.
+
+    tune_thread() is called by every data and device thread once it's started. It pins the thread to the configured
+    cores and requests SCHED_FIFO or a lower nice value for it, both Linux only. Whatever isn't allowed (SCHED_FIFO and
+    negative nice values usually need root or CAP_SYS_NICE) is skipped with a warning.
+
+    freeze_gc() moves everything allocated during startup out of the collector's reach and turns automatic collections
+    off, collect() then runs them at a known time instead, once a second from the management loop.
+    """
+    policies = (None, 'fifo', 'nice')
+
+    def __init__(self, data_cores=None, device_cores=None, policy=None, priority=10, nice=-10, gc_interval=60):
+        """
+        :param data_cores: CPU indices for the data thread, None leaves it to the OS
+        :param device_cores: CPU indices for the device threads, None leaves it to the OS
+        :param policy: None, 'fifo' or 'nice'
+        :param priority: SCHED_FIFO priority between 1 and 99, for 'fifo'
+        :param nice: nice value between -20 and 19, for 'nice'
+        :param gc_interval: seconds between full collections, the youngest generation is collected every second
+        """
+        if policy not in self.policies:
+            print(f'WARNING: unknown realtime_policy "{policy}", must be one of {self.policies}. Ignoring it.')
+            policy = None
+
+        self.cores = {'data': data_cores, 'device': device_cores}
+        self.policy = policy
+        self.priority = priority
+        self.nice = nice
+        self.gc_interval = gc_interval
+
+        self.gc_frozen = False
+        self.collected_at = 0
+        self.collections = 0
+        self.collection_ms = 0  # duration of the last collect()
+
+        self.warnings = set()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        :return: RealtimeTuning for the config, or None if realtime is disabled
+        """
+        if not config.get('realtime'):
+            return None
+
+        return cls(
+            data_cores=config.get('realtime_data_cores'),
+            device_cores=config.get('realtime_device_cores'),
+            policy=config.get('realtime_policy'),
+            priority=config.get('realtime_priority', 10),
+            nice=config.get('realtime_nice', -10),
+            gc_interval=config.get('gc_interval', 60),
+        )
+
+    def warn(self, message):
+        """
+        prints every warning only once, instead of once per thread
+        """
+        with self.lock:
+            if message in self.warnings:
+                return
+            self.warnings.add(message)
+
+        print(f'WARNING: {message}')
+
+    def tune_thread(self, role):
+        """
+        applies the affinity and scheduling policy to the calling thread
+
+        :param role: 'data' or 'device'
+        """
+        cores = self.cores.get(role)
+
+        if cores:
+            if hasattr(os, 'sched_setaffinity'):
+                try:
+                    os.sched_setaffinity(0, cores)  # 0 is the calling thread, not the whole process
+                except (OSError, ValueError) as error:
+                    self.warn(f'couldn\'t pin the {role} threads to the cores {cores} ({error})')
+            else:
+                self.warn('realtime_data_cores and realtime_device_cores are only available on Linux')
+
+        if self.policy == 'fifo':
+            if hasattr(os, 'sched_setscheduler'):
+                try:
+                    os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.priority))
+                except (OSError, ValueError) as error:
+                    self.warn(f'couldn\'t switch to SCHED_FIFO ({error}), it usually needs root or CAP_SYS_NICE')
+            else:
+                self.warn('realtime_policy "fifo" is only available on Linux')
+
+        if self.policy == 'nice':
+            if hasattr(os, 'setpriority') and hasattr(threading, 'get_native_id'):
+                try:
+                    # on Linux, the nice value belongs to the thread and not the whole process
+                    os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+                except OSError as error:
+                    self.warn(f'couldn\'t set the nice value to {self.nice} ({error})')
+            else:
+                self.warn('realtime_policy "nice" is only available on Linux and other unix systems')
+
+    def freeze_gc(self):
+        """
+        collects once more, then moves all objects into the permanent generation and disables automatic collections.
+        Meant to be called once everything is set up.
+        """
+        if self.gc_frozen:
+            return
+
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+
+        self.gc_frozen = True
+        self.collected_at = monotonic()
+
+    def collect(self):
+        """
+        the replacement for automatic collections: the youngest generation every call, all of them every gc_interval.
+        Objects frozen by freeze_gc() aren't looked at either way.
+
+        :return: the duration of the collection in ms
+        """
+        if not self.gc_frozen:
+            return 0
+
+        start = perf_counter_ns()
+
+        if monotonic() - self.collected_at >= self.gc_interval:
+            gc.collect()
+            self.collected_at = monotonic()
+        else:
+            gc.collect(0)
+
+        self.collections += 1
+        self.collection_ms = (perf_counter_ns() - start) / 1_000_000
+
+        return self.collection_ms
+
+    def restore_gc(self):
+        """
+        undoes freeze_gc()
+        """
+        if self.gc_frozen:
+            gc.enable()
+            gc.unfreeze()
+
+            self.gc_frozen = False
@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+
+__all__ = ['FrameRecorder', 'Recording']
+
+
+class FrameRecorder:
+    """
+    Appends raw_data frames along with their timestamps to a recording directory. Frames go into chunks of
+    chunk_frames frames, each a memory-mapped .npy file, so recording is a single copy per frame and
+    every chunk can be opened with np.load on its own. recording.json lists the chunks and how many
+    frames they really contain, since the last one is only filled partially.
+
+    A frame with another shape or dtype than the previous one starts a new chunk.
+    """
+
+    def __init__(self, path, chunk_frames=1024):
+        self.path = path
+        self.chunk_frames = chunk_frames
+
+        self.chunks = []
+        self.frames = None
+        self.timestamps = None
+        self.count = 0
+        self.started_at = None
+
+        # record(), write_manifest() and close() may come from different threads, record() writes the manifest too
+        self.lock = threading.RLock()
+        self.closed = False
+
+        os.makedirs(path, exist_ok=True)
+
+    def start_chunk(self, frame):
+        index = len(self.chunks)
+
+        self.frames = np.lib.format.open_memmap(
+            os.path.join(self.path, f'frames-{index:05d}.npy'),
+            mode='w+', dtype=frame.dtype, shape=(self.chunk_frames, *frame.shape),
+        )
+        self.timestamps = np.lib.format.open_memmap(
+            os.path.join(self.path, f'timestamps-{index:05d}.npy'),
+            mode='w+', dtype=np.int64, shape=(self.chunk_frames,),
+        )
+        self.count = 0
+
+        self.chunks.append({
+            'frames': f'frames-{index:05d}.npy',
+            'timestamps': f'timestamps-{index:05d}.npy',
+            'count': 0,
+        })
+
+    def record(self, frame, timestamp):
+        """
+        :param frame: raw_data, anything np.asarray can take
+        :param timestamp: perf_counter_ns of the frame, stored relative to the first one
+        """
+        frame = np.asarray(frame)
+
+        with self.lock:
+            if self.closed:
+                return
+
+            if self.started_at is None:
+                self.started_at = timestamp
+
+            if (
+                self.frames is None or self.count == self.chunk_frames
+                or frame.shape != self.frames.shape[1:] or frame.dtype != self.frames.dtype
+            ):
+                self.finish_chunk()
+                self.start_chunk(frame)
+
+            self.frames[self.count] = frame
+            self.timestamps[self.count] = timestamp - self.started_at
+            self.count += 1
+            self.chunks[-1]['count'] = self.count
+
+    def finish_chunk(self):
+        if self.frames is None:
+            return
+
+        self.frames.flush()
+        self.timestamps.flush()
+        self.write_manifest()
+
+    def write_manifest(self):
+        """
+        also called regularly while recording, so a crash only loses the frames since the last call.
+        The manifest is replaced as a whole, so it's never left half-written.
+        """
+        path = os.path.join(self.path, 'recording.json')
+
+        with self.lock:
+            with open(f'{path}.tmp', 'w') as file:
+                json.dump({'chunks': self.chunks}, file, indent=2)
+
+            os.replace(f'{path}.tmp', path)
+
+    def close(self):
+        with self.lock:
+            self.finish_chunk()
+            self.frames = None
+            self.timestamps = None
+            self.closed = True
+
+    @property
+    def recorded(self):
+        return sum(chunk['count'] for chunk in self.chunks)
+
+
+class Recording:
+    """
+    Reads what FrameRecorder wrote. Frames stay memory-mapped, so opening even long recordings is instant.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'recording.json')) as file:
+            chunks = [chunk for chunk in json.load(file)['chunks'] if chunk['count']]
+
+        if not chunks:
+            raise ValueError(f'the recording in {path} has no frames')
+
+        self.chunks = [
+            np.load(os.path.join(path, chunk['frames']), mmap_mode='r')[:chunk['count']] for chunk in chunks
+        ]
+        self.timestamps = np.concatenate([
+            np.load(os.path.join(path, chunk['timestamps']))[:chunk['count']] for chunk in chunks
+        ])
+
+        # index of the first frame of every chunk
+        self.offsets = np.cumsum([0] + [len(chunk) for chunk in self.chunks[:-1]])
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, index):
+        chunk = int(np.searchsorted(self.offsets, index, side='right')) - 1
+        return self.chunks[chunk][index - self.offsets[chunk]]
+
+    @property
+    def duration(self):
+        """
+        in ns, from the first to the last frame
+        """
+        return int(self.timestamps[-1])
+
+    def frame_at(self, time):
+        """
+        :param time: ns since the first frame
+        :return: index of the last frame recorded at or before that time
+        """
+        return max(int(np.searchsorted(self.timestamps, time, side='right')) - 1, 0)
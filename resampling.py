@@ -0,0 +1,97 @@
+import numpy as np
+
+
+__all__ = ['Resampler']
+
+
+class Resampler:
+    """
+    Maps arrays of any length onto a given amount of LEDs. The first axis is resampled, further ones
+    (like rgb channels) are kept. Whatever only depends on the lengths and mode (indices, weights)
+    is computed once per combination and cached, so every frame costs one or two vectorized operations.
+
+    modes:
+    - nearest: every LED takes the closest source value
+    - linear: every LED interpolates between the two closest source values
+    - area: every LED averages the part of the source it covers, best for shrinking lots of values onto few LEDs
+    """
+    modes = ('nearest', 'linear', 'area')
+
+    def __init__(self):
+        self.maps = {}
+
+    def __call__(self, data, leds, mode='linear'):
+        data = np.asarray(data)
+        source_length = len(data)
+
+        if source_length == leds:
+            return data
+
+        key = (source_length, leds, mode)
+        resampling_map = self.maps.get(key)
+
+        if resampling_map is None:
+            if mode not in self.modes:
+                raise ValueError(f'unknown resampling mode "{mode}", must be one of {self.modes}')
+
+            resampling_map = self.maps[key] = getattr(self, f'compile_{mode}')(source_length, leds)
+
+        return getattr(self, f'apply_{mode}')(data, *resampling_map)
+
+    @staticmethod
+    def positions(source_length, leds):
+        """
+        :return: the center of every LED in source coordinates, where source value i is centered at i
+        """
+        return (np.arange(leds) + 0.5) * source_length / leds - 0.5
+
+    def compile_nearest(self, source_length, leds):
+        indices = np.rint(self.positions(source_length, leds)).clip(0, source_length - 1).astype(np.intp)
+        return (indices,)
+
+    @staticmethod
+    def apply_nearest(data, indices):
+        return data.take(indices, axis=0)
+
+    def compile_linear(self, source_length, leds):
+        positions = self.positions(source_length, leds).clip(0, source_length - 1)
+
+        lower = np.floor(positions).astype(np.intp)
+        upper = np.minimum(lower + 1, source_length - 1)
+        weights = (positions - lower).astype(np.float32)
+
+        return lower, upper, weights
+
+    @staticmethod
+    def apply_linear(data, lower, upper, weights):
+        weights = weights.reshape((-1,) + (1,) * (data.ndim - 1))
+        lower_values = data.take(lower, axis=0)
+
+        return lower_values + (data.take(upper, axis=0) - lower_values) * weights
+
+    @staticmethod
+    def compile_area(source_length, leds):
+        # LED i covers the source from boundaries[i] to boundaries[i + 1]
+        boundaries = np.linspace(0, source_length, leds + 1)
+
+        indices = np.minimum(np.floor(boundaries), source_length - 1).astype(np.intp)
+        fractions = (boundaries - indices).astype(np.float32)
+        widths = np.diff(boundaries).astype(np.float32)
+
+        return indices, fractions, widths
+
+    @staticmethod
+    def apply_area(data, indices, fractions, widths):
+        """
+        integrates the source with a cumulative sum, reads it at the (fractional) LED boundaries
+        and divides the differences by the widths
+        """
+        shape = (-1,) + (1,) * (data.ndim - 1)
+        values = data.astype(np.float64)  # float32 sums lose precision on long inputs
+
+        cumulative = np.zeros((len(values) + 1,) + values.shape[1:])
+        np.cumsum(values, axis=0, out=cumulative[1:])
+
+        integral = cumulative.take(indices, axis=0) + values.take(indices, axis=0) * fractions.reshape(shape)
+
+        return np.diff(integral, axis=0) / widths.reshape(shape)
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter_ns
+
+
+__all__ = ['AsyncScheduler']
+
+
+class AsyncScheduler:
+    """
+    Alternative to running every loop in its own ManagedLoopThread: the management loop, the data loop and
+    all device loops run as tasks on a single asyncio event loop in one thread. data_processing,
+    device_processing and transports that may block run in a bounded pool of worker threads, so the amount
+    of threads stays the same no matter how many devices there are. Stopped loops wait on an event
+    instead of polling.
+
+    It offers the same start/stop/kill interface as ManagedLoopThread.
+    """
+
+    def __init__(self, core, workers=4):
+        self.core = core
+
+        self._alive = False
+        self._active = False
+        self._loop = asyncio.new_event_loop()
+        self._resumed = asyncio.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='immersivefx-worker', initializer=core.tune_thread,
+            initargs=('device',),
+        )
+        self._device_tasks = {}
+        self._thread = threading.Thread(target=self.run)
+
+    def run(self):
+        self.core.tune_thread('device')  # devices without blocking_send are sent from this thread
+        asyncio.set_event_loop(self._loop)
+
+        self._loop.run_until_complete(asyncio.gather(
+            self.management_loop(),
+            self.data_loop(),
+            *self._device_tasks.values(),
+        ))
+
+        self._executor.shutdown(wait=False)
+        self._loop.close()
+
+    def start_device_tasks(self):
+        """
+        creates a task for every device that doesn't have one yet
+        """
+        for device_name in self.core.devices:
+            if device_name not in self._device_tasks:
+                self._device_tasks[device_name] = self._loop.create_task(self.device_loop(device_name))
+
+    def start_device_tasks_threadsafe(self):
+        """
+        start_device_tasks() for other threads, like when devices were added by Core.reload()
+        """
+        self._loop.call_soon_threadsafe(self.start_device_tasks)
+
+    def start(self):
+        self._alive = True
+        self._active = True
+
+        if self._thread.ident:
+            self.start_device_tasks_threadsafe()
+        else:
+            self.start_device_tasks()
+            self._thread.start()
+
+        self._loop.call_soon_threadsafe(self._resumed.set)
+
+    def stop(self):
+        self._active = False
+        self._loop.call_soon_threadsafe(self._resumed.clear)
+
+    def kill(self):
+        self._active = False
+        self._alive = False
+        self._loop.call_soon_threadsafe(self._resumed.set)  # so waiting loops notice and return
+
+    async def running(self):
+        """
+        waits while the scheduler is stopped
+
+        :return: False once the scheduler got killed
+        """
+        while self._alive and not self._active:
+            await self._resumed.wait()
+
+        return self._alive
+
+    async def management_loop(self):
+        while await self.running():
+            await asyncio.sleep(1)
+            self.core.management_processing()
+
+    async def data_loop(self):
+        while not self.core.data_process and await self.running():
+            start = perf_counter_ns()
+
+            await self._loop.run_in_executor(self._executor, self.core.data_tick)
+
+            duration = (perf_counter_ns() - start) / 1_000_000
+            self.core.data_metrics.record(duration, await self.core.data_pacer.wait_async())
+
+    async def device_loop(self, device_name):
+        while await self.running() and device_name in self.core.devices:
+            device_instance = self.core.device_instances.get(device_name)
+
+            if not device_instance:  # the devices are being reopened
+                await asyncio.sleep(0.1)
+                continue
+
+            if not device_instance.enabled:
+                break
+
+            start = perf_counter_ns()
+
+            if device_instance.blocking_send:
+                await self._loop.run_in_executor(self._executor, self.core.device_tick, device_instance)
+            else:
+                if self.core.frame_is_new(device_instance):
+                    await self._loop.run_in_executor(
+                        self._executor, self.core.device_tick, device_instance, False,
+                    )
+
+                # if the lock is taken, the device is being closed
+                if device_instance.lock.acquire(blocking=False):
+                    try:
+                        if not device_instance.closed:
+                            device_instance.send(device_instance.frame)
+                    finally:
+                        device_instance.lock.release()
+
+            duration = (perf_counter_ns() - start) / 1_000_000
+
+            if device_instance.align_to_data:
+                device_instance.pacer.align(self.core.frames.published_at)
+            self.core.devices_metrics[device_name].record(duration, await device_instance.pacer.wait_async())
+
+        self._device_tasks.pop(device_name, None)
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def alive(self):
+        return self._alive
+
+    @property
+    def thread(self):
+        return self._thread
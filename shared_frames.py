@@ -0,0 +1,204 @@
+import multiprocessing
+import signal
+from multiprocessing import shared_memory
+from time import perf_counter_ns
+
+import numpy as np
+
+
+__all__ = ['SharedFrameRing', 'DataProcess']
+
+
+class SharedFrameRing:
+    """
+    Ring buffer of data frames in shared memory, with the same publish/latest interface as FrameExchange.
+
+    The header holds the latest sequence number, which also tells the slot of the frame (sequence % slots),
+    so readers never see one without the other. Every slot stores the shape of its frame (up to 4 dimensions) followed by its data,
+    which readers get as a numpy view without copying. A view stays valid until the writer wraps around the
+    ring, which takes slots - 1 more frames.
+    """
+    header_size = 64
+    slot_header_size = 64
+    max_dimensions = 4
+
+    default_capacity = 1024 * 1024  # bytes per frame
+
+    def __init__(self, frame, capacity=None, slots=4):
+        frame = np.asarray(frame)
+
+        self.dtype = frame.dtype
+        self.slots = slots
+        self.capacity = max(frame.nbytes, capacity or self.default_capacity)
+        self.slot_size = self.slot_header_size + self.capacity
+
+        self.shared_memory = shared_memory.SharedMemory(create=True, size=self.header_size + slots * self.slot_size)
+
+        # latest sequence number, published_at, duration of the last data_processing in ns
+        self.header = np.ndarray([3], dtype=np.int64, buffer=self.shared_memory.buf)
+        self.slot_headers = [
+            np.ndarray([1 + self.max_dimensions], dtype=np.int64, buffer=self.shared_memory.buf,
+                       offset=self.header_size + slot * self.slot_size)
+            for slot in range(slots)
+        ]
+        self.slot_data = [
+            np.ndarray([self.capacity], dtype=np.uint8, buffer=self.shared_memory.buf,
+                       offset=self.header_size + slot * self.slot_size + self.slot_header_size)
+            for slot in range(slots)
+        ]
+
+        self.pending = None  # array returned by back_buffer(), which already lives in the next slot
+
+        self.write(0, frame)
+        self.header[:] = [0, perf_counter_ns(), 0]
+
+    def view(self, slot, shape):
+        nbytes = int(np.prod(shape)) * self.dtype.itemsize
+        return self.slot_data[slot][:nbytes].view(self.dtype).reshape(shape)
+
+    def check_fits(self, shape):
+        if len(shape) > self.max_dimensions or int(np.prod(shape)) * self.dtype.itemsize > self.capacity:
+            raise ValueError(f'raw_data with shape {shape} doesn\'t fit into the shared memory slots, '
+                             f'increase shared_frame_bytes in your config')
+
+    def write(self, slot, frame):
+        frame = np.asarray(frame)
+        self.check_fits(frame.shape)
+
+        self.slot_headers[slot][:1 + frame.ndim] = [frame.ndim, *frame.shape]
+        np.copyto(self.view(slot, frame.shape), frame, casting='unsafe')
+
+    @property
+    def next_slot(self):
+        return (int(self.header[0]) + 1) % self.slots
+
+    def back_buffer(self, shape, dtype=None):
+        """
+        returns an array in the slot that gets published next, so publishing it doesn't need a copy.
+        Its dtype is always the one of the ring, which is the dtype raw_data had when the ring was created.
+        """
+        shape = tuple(int(size) for size in np.atleast_1d(shape))
+        self.check_fits(shape)
+        slot = self.next_slot
+
+        self.slot_headers[slot][:1 + len(shape)] = [len(shape), *shape]
+        self.pending = self.view(slot, shape)
+
+        return self.pending
+
+    def publish(self, frame):
+        slot = self.next_slot
+
+        if frame is not self.pending:
+            self.write(slot, frame)
+        self.pending = None
+
+        self.header[1] = perf_counter_ns()
+        self.header[0] = self.header[0] + 1  # the new frame and its slot become visible in the same step
+
+    def latest(self):
+        """
+        :return: tuple of the sequence number and a view on the latest published frame
+        """
+        sequence = int(self.header[0])
+        slot = sequence % self.slots
+        dimensions, *shape = self.slot_headers[slot]
+
+        return sequence, self.view(slot, tuple(shape[:dimensions]))
+
+    @property
+    def sequence(self):
+        return int(self.header[0])
+
+    @property
+    def published_at(self):
+        return int(self.header[1])
+
+    @property
+    def duration(self):
+        """
+        duration of the last data_processing call in ms
+        """
+        return self.header[2] / 1_000_000
+
+    @duration.setter
+    def duration(self, value):
+        self.header[2] = int(value * 1_000_000)
+
+    def close(self):
+        """
+        removes the shared memory's name, the mapping itself goes away with the ring and its views.
+        Unmapping it right away would crash threads that still read from it, they aren't joined when killed.
+        """
+        self.shared_memory.unlink()
+
+
+class DataProcess:
+    """
+    Runs the data loop of a Core in a forked worker process, which publishes raw_data into a SharedFrameRing.
+    Screen capture or audio analysis then get a whole core for themselves instead of sharing the GIL with the
+    device threads. Only raw_data makes it back to the main process, other changes data_processing
+    makes to the fxmode stay in the worker.
+
+    It offers the same start/stop/kill interface as ManagedLoopThread.
+    """
+
+    def __init__(self, core, capacity=None):
+        context = multiprocessing.get_context('fork')
+
+        self.core = core
+        self.ring = SharedFrameRing(core.raw_data, capacity=capacity)
+
+        self._alive = context.Event()
+        self._active = context.Event()
+        self._process = context.Process(target=self.loop, daemon=True)
+
+    def loop(self):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # the main process takes care of shutting down
+        self.core.tune_thread('data')
+
+        while self._alive.is_set():
+            self._active.wait()
+            self.core.data_pacer.restart()
+
+            while self._active.is_set():
+                start = perf_counter_ns()
+
+                self.core.data_tick()
+
+                self.ring.duration = (perf_counter_ns() - start) / 1_000_000
+                self.core.data_pacer.wait()
+
+    def start(self):
+        self._alive.set()
+        self._active.set()
+
+        if not self._process.ident:
+            self._process.start()
+
+    def stop(self):
+        self._active.clear()
+
+    def kill(self):
+        self._alive.clear()
+        self._active.set()  # wakes it up if it was stopped, so it can return
+        self._active.clear()
+
+        if self._process.ident:
+            self._process.join(timeout=1)
+            if self._process.is_alive():
+                self._process.terminate()
+
+        self.ring.close()
+
+    @property
+    def active(self):
+        return self._active.is_set()
+
+    @property
+    def alive(self):
+        return self._alive.is_set()
+
+    @property
+    def process(self):
+        return self._process
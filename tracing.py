@@ -0,0 +1,102 @@
+import itertools
+import json
+import os
+import threading
+from time import perf_counter_ns
+
+
+__all__ = ['FrameTracer']
+
+
+class FrameTracer:
+    """
+    Records how long every stage of a frame takes, from data_processing to the transport of each device.
+    Spans carry the sequence number of the data frame they belong to, so a slow send can be traced back to its data.
+
+    Spans go into a fixed-size ring of tuples, taking a slot is a single next() on an itertools.count,
+    which keeps recording cheap enough to leave enabled. The ring is written out in the Chrome trace format,
+    which opens in chrome://tracing or https://ui.perfetto.dev
+    """
+
+    def __init__(self, size=65536, enabled=False):
+        self.size = size
+        self.enabled = enabled  # records all the time, the ring keeps the last `size` spans
+        self.until = 0  # or only until this perf_counter_ns timestamp, see capture()
+
+        self.spans = [None] * size
+        self.slots = itertools.count()
+        self.tracks = {}
+        self.lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.enabled or perf_counter_ns() < self.until
+
+    def capture(self, seconds):
+        """
+        clears the ring and records for the given time, regardless of enabled
+        """
+        with self.lock:
+            self.spans = [None] * self.size
+            self.slots = itertools.count()
+            self.until = perf_counter_ns() + int(seconds * 1_000_000_000)
+
+    def track(self, name):
+        """
+        :return: the id of the track (shown as a thread in the trace viewer) with the given name
+        """
+        track = self.tracks.get(name)
+
+        if track is None:
+            with self.lock:
+                track = self.tracks.setdefault(name, len(self.tracks) + 1)
+
+        return track
+
+    def record(self, track, stage, frame, start, end, **details):
+        """
+        :param track: id from track()
+        :param stage: name of the stage, like 'device_processing'
+        :param frame: sequence number of the data frame
+        :param start: perf_counter_ns at the beginning of the stage
+        :param end: perf_counter_ns at its end
+        """
+        self.spans[next(self.slots) % self.size] = (track, stage, frame, start, end, details)
+
+    def chrome_trace(self):
+        """
+        :return: the recorded spans as dict in the Chrome trace event format, oldest first
+        """
+        pid = os.getpid()
+        spans = sorted((span for span in self.spans if span), key=lambda span: span[3])
+
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': track, 'args': {'name': name}}
+            for name, track in self.tracks.items()
+        ]
+
+        for track, stage, frame, start, end, details in spans:
+            events.append({
+                'name': stage,
+                'ph': 'X',
+                'pid': pid,
+                'tid': track,
+                'ts': start / 1000,
+                'dur': (end - start) / 1000,
+                'args': {'frame': frame, **details},
+            })
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path):
+        """
+        writes the recorded spans to a Chrome trace JSON file
+
+        :return: the amount of spans written
+        """
+        trace = self.chrome_trace()
+
+        with open(path, 'w') as file:
+            json.dump(trace, file, separators=(',', ':'))
+
+        return sum(event['ph'] == 'X' for event in trace['traceEvents'])
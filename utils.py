@@ -1,12 +1,49 @@
+import hashlib
 import os
+import site
+import sys
+from importlib import metadata
 
 
-def read_requirements():
-    requirement_paths = [
+# holds the environment_key() of the last successful check
+REQUIREMENTS_CACHE_PATH = '.requirements-checked'
+
+
+def get_requirement_paths():
+    return [
         'requirements.txt',
-        *[os.path.join('fxmodes', fxmode, 'requirements.txt') for fxmode in os.listdir('fxmodes')]
+        *[os.path.join('fxmodes', fxmode, 'requirements.txt') for fxmode in sorted(os.listdir('fxmodes'))]
     ]
 
+
+def environment_key(requirement_paths):
+    """
+    hashes everything the result of a check depends on: the requirement files, the interpreter (and therefore venv)
+    and the modification times of the site-packages directories, which change whenever packages are (un)installed
+    """
+    digest = hashlib.sha256()
+    digest.update(sys.executable.encode())
+    digest.update(sys.prefix.encode())
+
+    for requirement_path in requirement_paths:
+        try:
+            with open(requirement_path, 'rb') as file:
+                digest.update(requirement_path.encode())
+                digest.update(file.read())
+        except FileNotFoundError:
+            pass
+
+    site_packages = [*getattr(site, 'getsitepackages', list)(), site.getusersitepackages()]
+    for directory in site_packages:
+        try:
+            digest.update(f'{directory}:{os.stat(directory).st_mtime_ns}'.encode())
+        except OSError:
+            pass
+
+    return digest.hexdigest()
+
+
+def read_requirements(requirement_paths):
     requirements = {}
 
     for requirement_path in requirement_paths:
@@ -39,28 +76,31 @@ def read_requirements():
     return requirements
 
 
-def read_pip_freeze():
-    requirements = {}
-    output = os.popen('pip freeze').read()
+def installed_version(requirement):
+    """
+    :return: the installed version of a package, or None if it isn't installed
+    """
+    try:
+        return metadata.version(requirement)
+    except metadata.PackageNotFoundError:
+        return None
 
-    if output:
-        for line in output.split('\n'):
-            try:
-                requirement, version = line.split('==')
-                version = version.strip()
-                requirements[requirement] = version
-            except ValueError:
-                pass
 
-    return requirements
+def manage_requirements():
+    requirement_paths = get_requirement_paths()
+    key = environment_key(requirement_paths)
 
+    try:
+        with open(REQUIREMENTS_CACHE_PATH) as file:
+            if file.read().strip() == key:  # nothing changed since the last successful check
+                return
+    except OSError:
+        pass
 
-def manage_requirements():
     print('Checking requirements...')
-    installed_packages = read_pip_freeze()
     mismatched_packages = {}
-    for requirement, version in read_requirements().items():
-        pip_package_version = installed_packages.get(requirement)
+    for requirement, version in read_requirements(requirement_paths).items():
+        pip_package_version = installed_version(requirement)
         if pip_package_version:
             if not pip_package_version == version:
                 print(f'Package "{requirement}" is installed in version {pip_package_version} but {version} is needed')
@@ -93,3 +133,10 @@ def manage_requirements():
             exit(exit_code)
         else:
             pass
+
+    else:
+        try:
+            with open(REQUIREMENTS_CACHE_PATH, 'w') as file:
+                file.write(key)
+        except OSError:
+            pass